@@ -0,0 +1,159 @@
+from typing import Deque, Iterable, Optional
+from collections import deque
+from time import perf_counter
+import asyncio
+import json
+import math
+
+from .config import settings
+from .metrics import metrics
+
+class Overloaded(Exception):
+    """Raised when a request cannot start within the admission deadline"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Estimated wait exceeds deadline; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounded concurrency with a deadline-aware FIFO queue
+
+    At most ``capacity`` requests run at once. Later arrivals queue, unless
+    the estimated wait, i.e. their queue position times the moving average
+    service time divided by ``capacity``, already exceeds ``deadline``;
+    those are rejected immediately so the client can retry elsewhere or
+    later instead of timing out together with everyone else. Queued
+    requests that still have not started at the deadline are rejected too.
+    """
+
+    def __init__(self, capacity: int, deadline: float, max_queue: int = 100,
+                 initial_service_time: float = 1.0, smoothing: float = 0.2):
+        self.capacity = capacity
+        self.deadline = deadline
+        self.max_queue = max_queue
+        self.service_time = initial_service_time
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the request at ``position`` in the queue would start"""
+        return position * self.service_time / self.capacity
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot
+
+        Raises:
+            Overloaded: If the request would not start within the deadline
+        """
+        if self.in_flight < self.capacity and not self._waiters:
+            self.in_flight += 1
+            return
+        position = len(self._waiters) + 1
+        wait = self.estimated_wait(position)
+        if position > self.max_queue or wait > self.deadline:
+            raise Overloaded(max(wait, self.service_time))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        start = perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.deadline)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up
+                if isinstance(e, asyncio.TimeoutError):
+                    return
+                self.release()
+                raise
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            self._update_gauges()
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded(self.estimated_wait(len(self._waiters) + 1)) from None
+            raise
+        finally:
+            metrics.observe("admission_wait", perf_counter() - start)
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """
+        Free a slot, handing it to the oldest waiter if any
+
+        Args:
+            service_time: How long the request held the slot; updates the
+                moving average used to estimate waits
+        """
+        if service_time is not None:
+            self.service_time += self.smoothing * (service_time - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.in_flight -= 1
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("concierge_admission_in_flight", self.in_flight, "Requests holding an admission slot")
+        metrics.set_gauge("concierge_admission_queued", len(self._waiters), "Requests waiting for an admission slot")
+
+class AdmissionMiddleware:
+    """Applies an AdmissionController to requests for the given paths
+
+    Slots are held until the response body has been sent, so streamed chat
+    and voice responses count for their whole duration. Other paths, such
+    as auth and task management, bypass admission entirely.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str]):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        try:
+            await self.controller.acquire()
+        except Overloaded as e:
+            metrics.inc("concierge_admission_rejected_total", help="Requests shed by admission control")
+            return await self._reject(send, e.retry_after)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Fast failures (auth, rate limit) would skew the service time
+            self.controller.release(perf_counter() - start if status < 400 else None)
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = json.dumps({"detail": "Server is busy, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# Global admission controller for the chat and voice endpoints
+admission_controller = AdmissionController(
+    capacity=settings.ADMISSION_MAX_CONCURRENCY,
+    deadline=settings.ADMISSION_DEADLINE,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+)
@@ -0,0 +1,94 @@
+from typing import Any, Callable, Optional, Set
+from time import perf_counter
+import asyncio
+import inspect
+import logging
+
+from .config import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class WorkQueue:
+    """Bounded in-process queue for work that must not delay responses
+
+    Jobs are plain or async callables run by a fixed number of worker tasks
+    on the event loop, in submission order. Submitting never blocks: when
+    the queue is full the job is dropped and counted, since everything
+    queued here is best-effort bookkeeping. Before ``start`` (e.g. in tests
+    that skip the lifespan) jobs run as detached tasks instead.
+    """
+
+    def __init__(self, max_size: int = 1000, workers: int = 2):
+        self.max_size = max_size
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._detached: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the workers on the running event loop"""
+        self._queue = asyncio.Queue(self.max_size)
+        self._workers = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    def submit(self, name: str, fn: Callable[..., Any], *args) -> bool:
+        """
+        Queue a job
+
+        Args:
+            name: Job kind, used to label its metrics
+            fn: Callable or coroutine function to run
+            *args: Arguments for ``fn``
+
+        Returns:
+            False if the queue was full and the job was dropped
+        """
+        if self._queue is None:
+            task = asyncio.get_running_loop().create_task(self._execute(name, fn, args))
+            self._detached.add(task)
+            task.add_done_callback(self._detached.discard)
+            return True
+        try:
+            self._queue.put_nowait((name, fn, args, perf_counter()))
+        except asyncio.QueueFull:
+            metrics.inc("concierge_background_dropped_total", help="Background jobs dropped because the queue was full")
+            logger.warning("Background queue full, dropping %s job", name)
+            return False
+        metrics.set_gauge("concierge_background_queue_depth", self._queue.qsize(), "Background jobs waiting to run")
+        return True
+
+    async def _execute(self, name: str, fn: Callable[..., Any], args) -> None:
+        try:
+            with metrics.timer(f"background_{name}"):
+                result = fn(*args)
+                if inspect.isawaitable(result):
+                    await result
+        except Exception:
+            metrics.inc("concierge_background_failed_total", help="Background jobs that raised")
+            logger.exception("Background %s job failed", name)
+
+    async def _run(self) -> None:
+        while True:
+            name, fn, args, queued_at = await self._queue.get()
+            metrics.observe("background_queue_wait", perf_counter() - queued_at)
+            try:
+                await self._execute(name, fn, args)
+            finally:
+                self._queue.task_done()
+                metrics.set_gauge("concierge_background_queue_depth", self._queue.qsize())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Let queued jobs finish for up to ``timeout`` seconds, then stop"""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Dropping %d unfinished background jobs", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+# Global background work queue
+work_queue = WorkQueue(max_size=settings.BACKGROUND_QUEUE_SIZE, workers=settings.BACKGROUND_WORKERS)
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
 import os
+import tempfile
 
 class Settings(BaseSettings):
     """Application settings"""
@@ -12,18 +13,95 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv("JWT_SECRET", "your-secret-key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    BCRYPT_ROUNDS: int = 12  # log2 cost factor for new password hashes
+    PASSWORD_HASH_WORKERS: int = 2  # threads dedicated to bcrypt
+    TOKEN_CACHE_SIZE: int = 10000  # verified tokens kept in memory, 0 disables
+    # Operator-managed accounts as comma-separated username:bcrypt-hash pairs;
+    # only these can hold a tenant or admin rights
+    PROVISIONED_USERS: str = ""
     
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     
     # Rate Limiting
-    RATE_LIMIT_PER_MINUTE: int = 30
+    RATE_LIMIT_PER_MINUTE: int = 30  # bucket size; refills at this rate per user
+    RATE_LIMIT_DB: str = ""  # SQLite file shared by workers, default under runtime_dir()
+
+    # Admission control for chat and voice (0 concurrency disables it)
+    ADMISSION_MAX_CONCURRENCY: int = 32  # requests in flight per worker
+    ADMISSION_DEADLINE: float = 5.0  # seconds a request may wait to start
+    ADMISSION_MAX_QUEUE: int = 100  # waiting requests per worker
+
+    # Background work queue for post-response bookkeeping
+    BACKGROUND_QUEUE_SIZE: int = 1000  # jobs waiting per worker before dropping
+    BACKGROUND_WORKERS: int = 2  # concurrent background jobs per worker
+
+    # Voice
+    ENABLE_VOICE_SERVICE: bool = True  # start voice worker pools at startup
+    VOICE_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024  # largest accepted audio upload
+    TTS_WORKERS: int = 2  # processes each holding a warm TTS engine
+    TTS_MAX_QUEUE: int = 16  # syntheses waiting for a worker before 503
+    TTS_TIMEOUT: float = 30.0  # seconds before a synthesis counts as hung
+    TTS_VOICE: str = ""  # pyttsx3 voice id; empty uses the system default
+    TTS_RATE: int = 0  # words per minute; 0 uses the engine default
+    TTS_CACHE_DIR: str = "tts_cache"  # disk tier of the speech cache, empty disables it
+    TTS_CACHE_MEMORY_BYTES: int = 32 * 1024 * 1024  # speech kept in memory per worker
+    TTS_CACHE_DISK_BYTES: int = 512 * 1024 * 1024  # speech kept on disk per host
+    STT_MODEL: str = "base"  # local Whisper model: tiny, base, small, medium, large
+    STT_LANGUAGE: str = ""  # e.g. "en"; empty lets Whisper detect it
+    STT_WORKERS: int = 1  # processes each holding a loaded Whisper model
+    STT_MAX_QUEUE: int = 8  # transcriptions waiting for a worker before 503
+    STT_TIMEOUT: float = 120.0  # seconds before a transcription counts as hung
+    VAD_ENABLED: bool = True  # trim silence and reject silent clips before STT
+    VAD_THRESHOLD: float = 0.01  # RMS level, relative to full scale, that counts as sound
+    VAD_MAX_SILENCE: float = 0.3  # longest pause kept inside speech, in seconds
+    VAD_PADDING: float = 0.1  # seconds kept around speech
+
+    # WebSocket sessions
+    SESSION_MAX_TURNS: int = 4  # turns running at once on one connection
+    SESSION_SEND_BUFFER: int = 64  # frames queued for a slow client before turns wait
+    SESSION_IDLE_TIMEOUT: float = 300.0  # seconds without a message before closing
+
+    # Metrics
+    METRICS_DIR: str = ""  # per-worker metric files, default under runtime_dir()
+    METRICS_FLUSH_INTERVAL: float = 5.0  # seconds between per-worker metric writes
+
+    # On-demand request profiling (empty ADMIN_USERS disables it)
+    ADMIN_USERS: str = ""  # comma-separated provisioned usernames allowed to profile
+    PROFILE_DIR: str = ""  # stored profiles, default under runtime_dir()
+    PROFILE_MAX_STORED: int = 20  # most recent profiles kept
+    PROFILE_SAMPLE_INTERVAL: float = 0.005  # seconds between stack samples
     
+    # Knowledge bases, one per tenant (USER_TENANTS assigns users to tenants)
+    KNOWLEDGE_BASE_PATH: str = "knowledge_base.json"  # used for users without a tenant
+    KNOWLEDGE_BASE_DIR: str = "knowledge_bases"  # holds <tenant>.json files
+    KNOWLEDGE_BASE_MEMORY_BYTES: int = 256 * 1024 * 1024  # loaded indexes per worker, evicted LRU
+    USER_TENANTS: str = ""  # comma-separated username:tenant pairs
+
+    # Retrieval: "lexical", or "hybrid" to fuse lexical and vector results
+    RETRIEVAL_CONFIG_PATH: str = "retrieval_config.json"  # tuned parameters; overrides the settings below
+    RETRIEVAL_MODE: str = "lexical"
+    RETRIEVAL_DEADLINE: float = 0.5  # seconds hybrid retrieval waits for both engines
+    RETRIEVAL_CANDIDATES: int = 10  # documents each engine contributes to the fusion
+    RETRIEVAL_RRF_K: int = 60  # reciprocal rank fusion constant
+    RETRIEVAL_MAX_DISTANCE: float = 1.0  # vector results further from the query are dropped
+
     # ChromaDB
     CHROMA_HOST: str = "chroma"
     CHROMA_PORT: int = 8000
+    CHROMA_PATH: str = "./chroma_db"  # local vector store used by hybrid retrieval
+
+    # Task persistence, off unless TASK_STORE_DIR is set. Tasks are kept in
+    # process memory, so persistence needs a single uvicorn worker.
+    TASK_STORE_DIR: str = ""
+    TASK_FSYNC_INTERVAL: float = 1.0  # seconds between batched fsyncs, 0 = every write
+    TASK_SNAPSHOT_EVERY: int = 1000  # journal records between snapshots
 
     class Config:
         case_sensitive = True
 
+def runtime_dir() -> str:
+    """Host-local directory shared by all workers, in memory when available"""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
 settings = Settings()
@@ -0,0 +1,18 @@
+"""Shared OpenAI client
+
+Importing ``openai`` takes the better part of a second, so the client is
+created on first use instead of at import time. The lifespan warm-up in
+``main`` calls ``get_client`` before the worker reports ready, so requests
+normally never pay for it.
+"""
+import os
+
+_client = None
+
+def get_client():
+    """Return the process-wide AsyncOpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    return _client
@@ -0,0 +1,280 @@
+from typing import Dict, List, Optional
+from pathlib import Path
+from time import perf_counter
+import asyncio
+import bisect
+import json
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .config import settings, runtime_dir
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond lock waits to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_METRIC = "concierge_stage_seconds"
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus the implicit +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class _Timer:
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, perf_counter() - self.start)
+        return False
+
+class MetricsRegistry:
+    """Per-process metrics, aggregated across workers at scrape time
+
+    Each worker keeps plain in-memory counters and periodically writes them
+    to ``<directory>/worker-<pid>.json``. The worker that serves
+    ``/metrics`` first writes its own state, then sums every worker file,
+    so the exposition covers all processes on the host regardless of which
+    one answered.
+
+    Files left by exited workers are pruned at scrape time: their counters
+    and histograms are folded into ``merged.json`` so totals never go
+    backwards, while their gauges are dropped, since a dead process holds
+    no connections or queue slots. Liveness is checked by PID, which needs
+    a POSIX host; elsewhere every worker file is treated as live.
+    """
+
+    def __init__(self, directory: str, worker_id: Optional[str] = None):
+        self.directory = Path(directory)
+        self.worker_id = worker_id or str(os.getpid())
+        self._stages: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._help: Dict[str, str] = {STAGE_METRIC: "Time spent in each request processing stage"}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the duration of a processing stage"""
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            histogram = self._stages[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def timer(self, stage: str) -> _Timer:
+        """Context manager recording the duration of its body as ``stage``"""
+        return _Timer(self, stage)
+
+    def inc(self, name: str, amount: float = 1.0, help: str = "") -> None:
+        """Increment a counter"""
+        self._counters[name] = self._counters.get(name, 0.0) + amount
+        if help:
+            self._help.setdefault(name, help)
+
+    def set_gauge(self, name: str, value: float, help: str = "") -> None:
+        """Set this worker's value of a gauge; live workers' values are summed"""
+        self._gauges[name] = value
+        if help:
+            self._help.setdefault(name, help)
+
+    def _state(self) -> Dict:
+        return {
+            "stages": {
+                stage: {"counts": h.counts, "sum": h.sum, "count": h.count}
+                for stage, h in self._stages.items()
+            },
+            "counters": self._counters,
+            "gauges": self._gauges,
+            "help": self._help,
+        }
+
+    def flush(self) -> None:
+        """Write this worker's state for other workers to aggregate"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._write(self.directory / f"worker-{self.worker_id}.json", self._state())
+
+    def _worker_files(self) -> Dict[str, Path]:
+        return {path.stem[len("worker-"):]: path for path in self.directory.glob("worker-*.json")}
+
+    @staticmethod
+    def _alive(worker_id: str) -> bool:
+        if fcntl is None:
+            return True
+        try:
+            os.kill(int(worker_id), 0)
+        except ValueError:
+            # Not a PID, so there is nothing to check
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write(self, path: Path, state: Dict) -> None:
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _add(total: Dict, state: Dict) -> None:
+        for stage, data in state["stages"].items():
+            into = total["stages"].setdefault(stage, {"counts": [0] * len(data["counts"]), "sum": 0.0, "count": 0})
+            into["counts"] = [a + b for a, b in zip(into["counts"], data["counts"])]
+            into["sum"] += data["sum"]
+            into["count"] += data["count"]
+        for name, value in state["counters"].items():
+            total["counters"][name] = total["counters"].get(name, 0.0) + value
+        for name, text in state.get("help", {}).items():
+            total["help"].setdefault(name, text)
+
+    def _prune(self) -> None:
+        """Fold the files of exited workers into merged.json and delete them"""
+        dead = {
+            worker_id: path for worker_id, path in self._worker_files().items()
+            if worker_id != self.worker_id and not self._alive(worker_id)
+        }
+        if not dead:
+            return
+        with open(self.directory / "prune.lock", "w") as lock_file:
+            # One scraper at a time, or two could merge the same file
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            merged_path = self.directory / "merged.json"
+            merged = self._read(merged_path) or {"stages": {}, "counters": {}, "help": {}, "files": []}
+            # Files merged last time but not deleted before a crash
+            already = set(merged["files"])
+            files = []
+            for path in dead.values():
+                try:
+                    key = f"{path.name}:{path.stat().st_mtime_ns}"
+                except FileNotFoundError:
+                    continue
+                state = self._read(path)
+                if state is None:
+                    path.unlink(missing_ok=True)
+                    continue
+                if key not in already:
+                    self._add(merged, state)
+                files.append((key, path))
+            merged["files"] = [key for key, _ in files]
+            self._write(merged_path, merged)
+            for _, path in files:
+                path.unlink(missing_ok=True)
+
+    def _collect(self) -> List[Dict]:
+        states = []
+        merged = self._read(self.directory / "merged.json")
+        if merged is not None:
+            states.append(dict(merged, gauges={}))
+        for worker_id, path in self._worker_files().items():
+            state = self._read(path)
+            if state is None:
+                continue
+            if not self._alive(worker_id):
+                # Pruning lost a race with the worker exiting
+                state["gauges"] = {}
+            states.append(state)
+        return states
+
+    def render(self) -> str:
+        """Render metrics from all workers in the Prometheus text format"""
+        self.flush()
+        try:
+            self._prune()
+        except OSError:
+            logger.exception("Failed to prune metrics of exited workers")
+        stages: Dict[str, Histogram] = {}
+        counters: Dict[str, float] = {}
+        gauges: Dict[str, float] = {}
+        help_text = dict(self._help)
+        for state in self._collect():
+            for stage, data in state["stages"].items():
+                histogram = stages.setdefault(stage, Histogram())
+                histogram.counts = [a + b for a, b in zip(histogram.counts, data["counts"])]
+                histogram.sum += data["sum"]
+                histogram.count += data["count"]
+            for name, value in state["counters"].items():
+                counters[name] = counters.get(name, 0.0) + value
+            for name, value in state["gauges"].items():
+                gauges[name] = gauges.get(name, 0.0) + value
+            for name, text in state.get("help", {}).items():
+                help_text.setdefault(name, text)
+
+        lines = [
+            f"# HELP {STAGE_METRIC} {help_text[STAGE_METRIC]}",
+            f"# TYPE {STAGE_METRIC} histogram",
+        ]
+        for stage in sorted(stages):
+            histogram = stages[stage]
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {histogram.count}')
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted(values):
+                if name in help_text:
+                    lines.append(f"# HELP {name} {help_text[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {values[name]}")
+        return "\n".join(lines) + "\n"
+
+    def start(self, interval: float) -> None:
+        """Start periodically flushing this worker's state"""
+        self._flusher = asyncio.create_task(self._run(interval))
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Failed to write metrics")
+
+    async def stop(self) -> None:
+        """Stop flushing and write the final state"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        self.flush()
+
+metrics = MetricsRegistry(settings.METRICS_DIR or os.path.join(runtime_dir(), "ai_concierge_metrics"))
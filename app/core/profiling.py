@@ -0,0 +1,184 @@
+from typing import Dict, List, Optional
+from collections import Counter
+from pathlib import Path
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from jose import JWTError
+
+from .config import settings, runtime_dir
+from ..routers.auth import decode_token, provisioned_users
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval
+
+    Stacks are accumulated in the collapsed ("folded") format understood by
+    flamegraph.pl, speedscope and inferno: ``root;caller;callee <count>``.
+    Sampling happens on a separate thread, so the profiled code runs
+    unmodified.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the folded stacks"""
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+class ProfileStore:
+    """Keeps the most recent request profiles on disk
+
+    Profiles are written under a host-local directory so that any worker can
+    serve a profile recorded by another one.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 20):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profile_id: str, folded: str, info: Dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile_id}.folded").write_text(folded, encoding="utf-8")
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(info), encoding="utf-8")
+        for path in self._infos()[self.max_profiles:]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".folded").unlink(missing_ok=True)
+
+    def _infos(self) -> List[Path]:
+        paths = list(self.directory.glob("*.json")) if self.directory.exists() else []
+        return sorted(paths, key=lambda path: path.stat().st_mtime, reverse=True)
+
+    def list(self) -> List[Dict]:
+        """Return metadata for stored profiles, newest first"""
+        infos = []
+        for path in self._infos():
+            try:
+                infos.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return infos
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """Return the folded stacks of a profile, or None if unknown"""
+        if not profile_id.isalnum():
+            return None
+        path = self.directory / f"{profile_id}.folded"
+        try:
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+class ProfilingMiddleware:
+    """Profiles single requests on demand for admin users
+
+    A request is profiled when it carries an ``X-Profile`` header or a
+    ``profile=1`` query parameter *and* a bearer token for a user listed in
+    ``ADMIN_USERS``; anyone else's flag is ignored. The profile id is
+    returned in the ``X-Profile-Id`` response header.
+
+    The sampler watches the event loop thread, so concurrent requests served
+    while the profiled one is in flight appear in its profile too.
+    Main only installs this middleware when ``ADMIN_USERS`` is set.
+    """
+
+    def __init__(self, app, store: ProfileStore, admins, interval: float):
+        self.app = app
+        self.store = store
+        self.admins = admins
+        self.interval = interval
+
+    def _admin(self, scope) -> Optional[str]:
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        flagged = "1" in query.get("profile", ())
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                flagged = True
+            elif name == b"authorization" and value[:7].lower() == b"bearer ":
+                token = value[7:].decode("latin-1")
+        if not flagged or token is None:
+            return None
+        try:
+            username = decode_token(token).get("sub")
+        except JWTError:
+            return None
+        return username if username in self.admins else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        username = self._admin(scope)
+        if username is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        started = time.time()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            folded = profiler.stop()
+            self.store.save(profile_id, folded, {
+                "id": profile_id,
+                "user": username,
+                "method": scope["method"],
+                "path": scope["path"],
+                "started_at": started,
+                "duration_s": round(time.time() - started, 4),
+                "samples": sum(profiler.samples.values()),
+            })
+
+def admin_users() -> set:
+    """
+    Usernames allowed to profile requests and read profiles
+
+    Only names in ADMIN_USERS that are provisioned accounts count; anyone
+    could register an unprovisioned name after a restart.
+    """
+    listed = {name.strip() for name in settings.ADMIN_USERS.split(",") if name.strip()}
+    return listed & provisioned_users().keys()
+
+profile_store = ProfileStore(
+    settings.PROFILE_DIR or os.path.join(runtime_dir(), "ai_concierge_profiles"),
+    max_profiles=settings.PROFILE_MAX_STORED,
+)
@@ -0,0 +1,129 @@
+from typing import NamedTuple, Optional
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from fastapi import Depends, HTTPException, Response, status
+
+from .config import settings, runtime_dir
+from .metrics import metrics
+from ..routers.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+
+class RateLimitDecision(NamedTuple):
+    """Outcome of a rate limit check"""
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+class TokenBucketLimiter:
+    """Token bucket rate limiter shared across worker processes
+
+    Each key owns a bucket of ``capacity`` tokens refilled continuously at
+    ``refill_per_second``. Bucket state lives in a small SQLite database so
+    every worker on the host draws from the same bucket; each decision is a
+    single-row read and upsert inside one short write transaction.
+
+    Checks block for up to the SQLite busy timeout while other workers hold
+    the database, so callers on the event loop should run them in a thread.
+    If the database stays locked the check fails open: limiting is a
+    safeguard, not worth failing the request over.
+    """
+
+    def __init__(self, path: str, capacity: float, refill_per_second: float, busy_timeout: float = 1.0):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        # The connection is created at import time but used from threadpool
+        # threads; the lock serialises them.
+        self._db = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Losing a few refills on power loss is fine for rate limiting
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def acquire(self, key: str, cost: float = 1.0, now: Optional[float] = None) -> RateLimitDecision:
+        """
+        Take ``cost`` tokens from a key's bucket if available
+
+        Args:
+            key: Bucket key, e.g. the authenticated username
+            cost: Tokens to take
+            now: Current time in seconds since the epoch
+
+        Returns:
+            Whether the request is allowed, the tokens left, and the seconds
+            until enough tokens will have accumulated if it is not
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            try:
+                return self._acquire(key, cost, now)
+            except sqlite3.OperationalError as e:
+                metrics.inc("concierge_rate_limit_errors_total",
+                            help="Rate limit checks allowed through because the database was unavailable")
+                logger.warning("Rate limit check for %s failed open: %s", key, e)
+                return RateLimitDecision(True, self.capacity, 0.0)
+
+    def _acquire(self, key: str, cost: float, now: float) -> RateLimitDecision:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                tokens = self.capacity
+            else:
+                elapsed = max(0.0, now - row[1])
+                tokens = min(self.capacity, row[0] + elapsed * self.refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._db.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        retry_after = 0.0 if allowed else (cost - tokens) / self.refill_per_second
+        return RateLimitDecision(allowed, tokens, retry_after)
+
+rate_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_DB or os.path.join(runtime_dir(), "ai_concierge_rate_limit.sqlite3"),
+    capacity=settings.RATE_LIMIT_PER_MINUTE,
+    refill_per_second=settings.RATE_LIMIT_PER_MINUTE / 60,
+)
+
+def rate_limit(response: Response, username: str = Depends(get_current_user)) -> None:
+    """Dependency charging one request against the user's bucket
+
+    A plain function, so FastAPI runs it in the threadpool and a busy
+    database never stalls the event loop.
+
+    Raises:
+        HTTPException: 429 with Retry-After when the bucket is empty
+    """
+    with metrics.timer("rate_limit"):
+        decision = rate_limiter.acquire(username)
+    headers = {
+        "X-RateLimit-Limit": str(settings.RATE_LIMIT_PER_MINUTE),
+        "X-RateLimit-Remaining": str(int(decision.remaining)),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(math.ceil(decision.retry_after))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers=headers,
+        )
+    response.headers.update(headers)
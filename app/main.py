@@ -1,17 +1,98 @@
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import logging
+
+from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi.responses import PlainTextResponse
 
-from .routers import auth, concierge
+from .routers import admin, auth, concierge, session
+from .core.admission import AdmissionMiddleware, admission_controller
+from .core.background import work_queue
 from .core.config import settings
+from .core.llm import get_client
+from .core.metrics import metrics
+from .core.profiling import ProfilingMiddleware, admin_users, profile_store
+from .tools.manage_tasks import task_manager
+from .tools.reminders import reminder_scheduler
+from .tools.task_store import TaskStore
+from .tools.knowledge_bases import knowledge_bases
+from .tools import voice
+
+logger = logging.getLogger(__name__)
+
+# Imported on first voice request otherwise; optional in API-only deployments
+VOICE_MODULES = ("speech_recognition", "pyttsx3")
+
+def load_subsystems() -> None:
+    """Build the clients and indexes that importing the app no longer does"""
+    get_client()
+    for module in VOICE_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            logger.warning("Voice dependency %s is not installed", module)
+
+async def warm_up(app: FastAPI) -> None:
+    """Load heavy subsystems off the event loop, then report ready"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, load_subsystems)
+        # Other tenants' knowledge bases load on their first request
+        await knowledge_bases.get()
+    except Exception:
+        logger.exception("Warm-up failed; worker will stay not ready")
+        return
+    if settings.ENABLE_VOICE_SERVICE:
+        pools = (voice.stt_pool, voice.tts_pool)
+        results = await asyncio.gather(*(pool.start() for pool in pools), return_exceptions=True)
+        for pool, result in zip(pools, results):
+            if isinstance(result, Exception):
+                # Text chat still works; voice requests retry the start
+                logger.error("Could not start %s workers: %s", pool.name, result)
+        if voice.tts_pool.started:
+            work_queue.submit("tts_prewarm", voice.prewarm, concierge.FIXED_REPLIES)
+    app.state.ready = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Restore durable state on startup and flush it on shutdown
 
-app = FastAPI(title="AI Concierge")
-limiter = Limiter(key_func=get_remote_address)
+    Heavy subsystems are warmed up in the background so ``/health`` answers
+    immediately; ``/ready`` turns healthy once the warm-up has finished.
+    """
+    app.state.ready = False
+    warm_up_task = asyncio.create_task(warm_up(app))
+    if settings.TASK_STORE_DIR:
+        store = TaskStore(
+            settings.TASK_STORE_DIR,
+            fsync_interval=settings.TASK_FSYNC_INTERVAL,
+            snapshot_every=settings.TASK_SNAPSHOT_EVERY,
+        )
+        if not task_manager.open_store(store):
+            # Tasks live in this process's memory, so a second worker could
+            # neither persist its writes nor see the first one's
+            raise RuntimeError(
+                f"Task store {settings.TASK_STORE_DIR} is owned by another process; "
+                "run a single worker, or set TASK_STORE_DIR= to run several without persistence"
+            )
+    reminder_scheduler.start()
+    work_queue.start()
+    metrics.start(settings.METRICS_FLUSH_INTERVAL)
+    yield
+    warm_up_task.cancel()
+    await work_queue.stop()
+    await voice.stt_pool.stop()
+    await voice.tts_pool.stop()
+    await metrics.stop()
+    await reminder_scheduler.stop()
+    await task_manager.close_store()
+
+app = FastAPI(title="AI Concierge", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,11 +102,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Shed chat and voice load early instead of letting it queue behind the LLM
+if settings.ADMISSION_MAX_CONCURRENCY > 0:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        paths=["/concierge/chat", "/concierge/voice"],
+    )
+
+# Only installed when someone may use it, so requests pay nothing otherwise
+if admin_users():
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        admins=admin_users(),
+        interval=settings.PROFILE_SAMPLE_INTERVAL,
+    )
+
 # Include routers
 app.include_router(auth.router, tags=["auth"])
 app.include_router(concierge.router, prefix="/concierge", tags=["concierge"], dependencies=[Depends(auth.get_current_user)])
+# Authenticates once per connection itself; browsers cannot send headers on WebSockets
+app.include_router(session.router, prefix="/concierge", tags=["concierge"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint; 503 until the worker has finished warming up"""
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Warming up"
+        )
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics aggregated across all workers on this host"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
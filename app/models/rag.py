@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal, Optional, Tuple
 import json
 from difflib import SequenceMatcher
 
@@ -20,9 +20,26 @@ class GradingResult(BaseModel):
     answer_coverage: float
     refined_query: Optional[str] = None
 
+class RetrievalConfig(BaseModel):
+    """Tunable retrieval parameters; see benchmarks/tune_retrieval.py"""
+    engine: Literal["lexical", "hybrid"] = "lexical"
+    k: int = Field(3, ge=1)  # documents returned
+    min_score: float = 0.05  # lower threshold for relevance
+    # How query/text similarity is scored: Jaccard term overlap, difflib
+    # sequence ratio, or the larger of the two
+    similarity: Literal["max", "jaccard", "sequence"] = "max"
+    use_topics: bool = True  # also match the query against metadata topics
+    grade_cutoff: float = 0.3  # term overlap at which a document counts toward coverage
+    candidates: int = Field(10, ge=1)  # per-engine documents fused in hybrid mode
+    rrf_k: int = Field(60, ge=1)  # reciprocal rank fusion constant
+    # Vector results further than this from the query are dropped; Chroma's
+    # default squared L2 on normalized embeddings, so 1.0 is cosine 0.5
+    max_distance: float = 1.0
+
 class RAGSystem:
-    def __init__(self, knowledge_base_path: str):
+    def __init__(self, knowledge_base_path: str, config: Optional[RetrievalConfig] = None):
         self.knowledge_base = self._load_knowledge_base(knowledge_base_path)
+        self.config = config or RetrievalConfig()
     
     def _load_knowledge_base(self, path: str) -> List[Dict]:
         with open(path, 'r') as f:
@@ -41,32 +58,39 @@ class RAGSystem:
         
         # Calculate Jaccard similarity
         jaccard = len(query_terms & text_terms) / len(query_terms | text_terms)
+        if self.config.similarity == "jaccard":
+            return jaccard
         
         # Calculate sequence similarity
         sequence_sim = SequenceMatcher(None, query.lower(), text.lower()).ratio()
+        if self.config.similarity == "sequence":
+            return sequence_sim
         
         # Combine both metrics
         return max(jaccard, sequence_sim)
     
-    async def retrieve_docs(self, query: str, k: int = 3) -> RetrievalResult:
-        # Calculate similarity scores for each document
+    def score_docs(self, query: str) -> List[Tuple[Dict, float]]:
+        """Every document with its similarity to the query, best first"""
         scored_docs = []
         for doc in self.knowledge_base:
             # Calculate similarity with full query
-            full_sim = self._calculate_similarity(query, doc['content'])
+            score = self._calculate_similarity(query, doc['content'])
             
             # Calculate similarity with metadata topics
-            topic_sim = max(
-                self._calculate_similarity(query, topic)
-                for topic in [doc.get('metadata', {}).get('topic', ''), doc.get('metadata', {}).get('subtopic', '')]
-            )
+            if self.config.use_topics:
+                score = max(score, max(
+                    self._calculate_similarity(query, topic)
+                    for topic in [doc.get('metadata', {}).get('topic', ''), doc.get('metadata', {}).get('subtopic', '')]
+                ))
             
-            # Use the maximum similarity score
-            scored_docs.append((doc, max(full_sim, topic_sim)))
+            scored_docs.append((doc, score))
         
-        # Sort by similarity score and take top k
+        # Sort by similarity score
         scored_docs.sort(key=lambda x: x[1], reverse=True)
-        top_docs = scored_docs[:k]
+        return scored_docs
+    
+    async def retrieve_docs(self, query: str, k: Optional[int] = None) -> RetrievalResult:
+        top_docs = self.score_docs(query)[:k or self.config.k]
         
         return RetrievalResult(
             query=query,
@@ -77,7 +101,7 @@ class RAGSystem:
                     metadata=doc.get('metadata', {})
                 )
                 for doc, score in top_docs
-                if score > 0.05  # Lower threshold for relevance
+                if score > self.config.min_score
             ]
         )
     
@@ -93,7 +117,7 @@ class RAGSystem:
             relevance_scores.append(overlap)
         
         relevance = max(relevance_scores) if relevance_scores else 0
-        coverage = sum(1 for score in relevance_scores if score > 0.3) / 3
+        coverage = sum(1 for score in relevance_scores if score > self.config.grade_cutoff) / self.config.k
         
         return GradingResult(
             factual_relevance=relevance,
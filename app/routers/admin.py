@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from .auth import get_current_user
+from ..core.profiling import admin_users, profile_store
+
+router = APIRouter()
+
+async def get_admin_user(username: str = Depends(get_current_user)) -> str:
+    """Dependency allowing only users listed in ADMIN_USERS"""
+    if username not in admin_users():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return username
+
+@router.get("/profiles")
+async def list_profiles(username: str = Depends(get_admin_user)):
+    """List stored request profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, username: str = Depends(get_admin_user)):
+    """
+    Return a profile as folded stacks
+
+    The output can be fed straight to flamegraph.pl or loaded in speedscope.
+    """
+    folded = profile_store.get(profile_id)
+    if folded is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return PlainTextResponse(folded)
@@ -3,13 +3,23 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import asyncio
+import time
 
 from ..core.config import settings
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the
+# event loop without letting a login storm starve other executor work.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 # In-memory user store (replace with database in production)
@@ -26,11 +36,85 @@ class User(BaseModel):
     username: str
     password: str
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified tokens and their claims
+
+    Entries expire at the token's own ``exp`` claim, so a cached token is
+    never accepted past the point where ``jwt.decode`` would reject it.
+    Only successfully verified tokens are cached.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return claims
+
+    def put(self, token: str, claims: Dict) -> None:
+        if "exp" not in claims or self.max_size <= 0:
+            return
+        self._entries[token] = (claims, float(claims["exp"]))
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
+
+def decode_token(token: str) -> Dict:
+    """
+    Verify a JWT and return its claims, using the verified-token cache
+
+    Raises:
+        JWTError: If the token is invalid or expired
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM])
+        token_cache.put(token, claims)
+    return claims
+
+def _pairs(value: str) -> Dict[str, str]:
+    pairs = (entry.partition(":") for entry in value.split(","))
+    return {name.strip(): other.strip() for name, _, other in pairs if name.strip() and other.strip()}
+
+def provisioned_users() -> Dict[str, str]:
+    """Password hash of each account the operator set up in PROVISIONED_USERS"""
+    return _pairs(settings.PROVISIONED_USERS)
+
+def user_tenants() -> Dict[str, str]:
+    """Tenant of each user, as assigned by the operator in USER_TENANTS"""
+    return _pairs(settings.USER_TENANTS)
+
+def reserved_usernames() -> set:
+    """Names that carry server-assigned rights and cannot be self-registered"""
+    admins = {name.strip() for name in settings.ADMIN_USERS.split(",") if name.strip()}
+    return set(user_tenants()) | set(provisioned_users()) | admins
+
+def load_provisioned_users() -> None:
+    """Add the provisioned accounts to the user store"""
+    fake_users_db.update(provisioned_users())
+
+load_provisioned_users()
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -39,33 +123,62 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.ALGORITHM)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    """Resolve the authenticated username from a bearer token
+
+    FastAPI caches dependency results per request, so the router-level and
+    endpoint-level uses of this dependency share a single call.
+    """
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
+        username: Optional[str] = decode_token(token).get("sub")
     except JWTError:
-        raise credentials_exception
-    user = fake_users_db.get(token_data.username)
-    if user is None:
-        raise credentials_exception
-    return token_data.username
+        username = None
+    if username is None or username not in fake_users_db:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return username
+
+def tenant_of(username: str) -> Optional[str]:
+    """
+    Tenant of a user, if the operator assigned one
+
+    Only provisioned accounts get their tenant: the user store is in memory,
+    so after a restart anyone could otherwise register a mapped name first.
+    """
+    if username not in provisioned_users():
+        return None
+    return user_tenants().get(username)
+
+async def get_current_tenant(username: str = Depends(get_current_user)) -> Optional[str]:
+    """Tenant of the authenticated user, selecting the knowledge base to answer from
+
+    Tenants are only ever assigned on the server, never taken from the
+    request or the token, so users cannot reach another client's data.
+    """
+    return tenant_of(username)
 
 @router.post("/register", response_model=Token)
 async def register(user: User):
     """Register a new user"""
+    if user.username in reserved_usernames():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Username is reserved"
+        )
+    if user.username in fake_users_db:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
+    hashed_password = await get_password_hash(user.password)
     if user.username in fake_users_db:
+        # Registered concurrently while we were hashing
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-    hashed_password = get_password_hash(user.password)
     fake_users_db[user.username] = hashed_password
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -74,7 +187,7 @@ async def register(user: User):
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login and get JWT token"""
     user = fake_users_db.get(form_data.username)
-    if not user or not verify_password(form_data.password, user):
+    if not user or not await verify_password(form_data.password, user):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1,40 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, File, UploadFile
-from fastapi.responses import StreamingResponse
-import speech_recognition as sr
-import pyttsx3
-import tempfile
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, File, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import base64
 import os
-from concurrent.futures import ThreadPoolExecutor
-from pydantic import BaseModel
-from typing import Optional, Dict, List, Union
+import zlib
+from pydantic import BaseModel, Field, model_validator
+from typing import Callable, Optional, Dict, List, Literal, Union
 from datetime import datetime
 import json
-from openai import AsyncOpenAI
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import logging
+from time import perf_counter
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-from ..dependencies import get_current_user
+from ..dependencies import get_current_user, get_current_tenant
 from ..tools.manage_tasks import task_manager
-from ..tools.retrieve_docs import rag_system
+from ..tools.reminders import reminder_scheduler
+from ..tools.schedule import parse_duration
+from ..tools import voice
+from ..tools.worker_pool import PoolBusy
+from ..tools.knowledge_bases import Retriever, UnknownTenant, knowledge_bases
 
 from ..core.config import settings
-from ..models.rag import RAGSystem
+from ..core.rate_limit import rate_limit
+from ..core.metrics import metrics
+from ..core.background import work_queue
+from ..core.llm import get_client
 from ..core.reflection import reflection
 from .auth import get_current_user, create_access_token
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
-executor = ThreadPoolExecutor()
-
-# Initialize RAG system
-rag_system = RAGSystem('knowledge_base.json')
+logger = logging.getLogger(__name__)
 
 # Session memory store
 session_memory = {}
 
+# Fixed replies; their speech is rendered into the TTS cache at startup
+NO_TASKS_REPLY = "You have no tasks scheduled."
+GOOD_FEEDBACK_REPLY = "Thank you for the positive feedback!"
+BAD_FEEDBACK_REPLY = "I'll try to improve. Thank you for the feedback."
+OUT_OF_SCOPE_REPLY = "I'm sorry, my knowledge base doesn't cover that topic adequately."
+FIXED_REPLIES = (NO_TASKS_REPLY, GOOD_FEEDBACK_REPLY, BAD_FEEDBACK_REPLY, OUT_OF_SCOPE_REPLY)
+
 class ChatMessage(BaseModel):
     """Chat message model for user input
     
@@ -75,14 +81,15 @@ class TaskResponse(BaseModel):
     status: str
     task: Optional[Dict] = None
     tasks: Optional[List[Dict]] = None
+    next_cursor: Optional[str] = None
     message: str
 
-@router.post("/chat", response_model=None)
-@limiter.limit("30/minute")
+@router.post("/chat", response_model=None, dependencies=[Depends(rate_limit)])
 async def chat(
     request: Request,
     message: ChatMessage,
-    username: str = Depends(get_current_user)
+    username: str = Depends(get_current_user),
+    tenant: Optional[str] = Depends(get_current_tenant)
 ):
     """Main chat endpoint for the AI concierge
     
@@ -90,6 +97,7 @@ async def chat(
         request: FastAPI request object
         message: User's chat message
         username: Authenticated username
+        tenant: Tenant whose knowledge base answers the question
     
     Returns:
         Either a streaming response or a complete chat response
@@ -141,7 +149,7 @@ async def chat(
                 feedback_score=session_memory[username]["feedback_score"]
             )
         return ChatResponse(
-            response="You have no tasks scheduled.",
+            response=NO_TASKS_REPLY,
             sources=None,
             feedback_score=session_memory[username]["feedback_score"]
         )
@@ -160,19 +168,21 @@ async def chat(
         if message.message.startswith("/"):
             if message.message == "/good_answer":
                 reflection.add_feedback(True)
-                return ChatResponse(response="Thank you for the positive feedback!")
+                return ChatResponse(response=GOOD_FEEDBACK_REPLY)
             elif message.message == "/bad_answer":
                 reflection.add_feedback(False)
-                return ChatResponse(response="I'll try to improve. Thank you for the feedback.")
+                return ChatResponse(response=BAD_FEEDBACK_REPLY)
         
-        # Get retrieval results
-        retrieval_result = await rag_system.retrieve_docs(message.message)
-        
-        # Grade retrieval results
-        grade = await rag_system.grade_retrieval(message.message, retrieval_result)
+        # Get retrieval results from the tenant's knowledge base
+        try:
+            rag = await knowledge_bases.get(tenant)
+        except UnknownTenant as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        with metrics.timer("retrieval"):
+            retrieval_result = await rag.retrieve_docs(message.message)
         
-        # Log scores for debugging
-        print(f"Self-grading scores - Relevance: {grade.factual_relevance}, Coverage: {grade.answer_coverage}")
+        # Grading is telemetry only; keep it off the response path
+        work_queue.submit("grading", record_grading, rag, message.message, retrieval_result)
         
         # If we have any relevant documents, try to generate a response
         if retrieval_result.docs:
@@ -180,21 +190,28 @@ async def chat(
             prompt_modifier = reflection.get_prompt_modifier()
             BASE_PROMPT = "You are an AI concierge helping with AI technology questions. "
             system_prompt = f"{BASE_PROMPT} {prompt_modifier}"
-            
-            response = await client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Question: {message.message}\n\nContext: {[doc.content for doc in retrieval_result.docs]}"}
-                ],
-                stream=message.stream
-            )
+            conversation = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Question: {message.message}\n\nContext: {[doc.content for doc in retrieval_result.docs]}"}
+            ]
             
             if message.stream:
-                return StreamingResponse(stream_response(response), media_type="text/event-stream")
+                return StreamingResponse(
+                    stream_response(conversation, lambda answer: work_queue.submit(
+                        "history", record_history, username, message.message, answer
+                    )),
+                    media_type="text/event-stream"
+                )
+            
+            with metrics.timer("llm_total"):
+                response = await get_client().chat.completions.create(
+                    model="gpt-4",
+                    messages=conversation
+                )
             
             answer = response.choices[0].message.content
             sources = [{"source": doc.source, "content": doc.content[:100]} for doc in retrieval_result.docs]
+            work_queue.submit("history", record_history, username, message.message, answer)
             
             return ChatResponse(
                 response=answer,
@@ -203,7 +220,7 @@ async def chat(
             )
         else:
             return ChatResponse(
-                response="I'm sorry, my knowledge base doesn't cover that topic adequately.",
+                response=OUT_OF_SCOPE_REPLY,
                 sources=None,
                 feedback_score=session_memory[username]["feedback_score"]
             )
@@ -213,7 +230,7 @@ async def chat(
         BASE_PROMPT = "You are an AI concierge helping with AI technology questions. "
         system_prompt = f"{BASE_PROMPT} {prompt_modifier}"
         
-        response = await client.chat.completions.create(
+        response = await get_client().chat.completions.create(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -234,6 +251,8 @@ async def chat(
             feedback_score=session_memory[username]["feedback_score"]
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -260,7 +279,7 @@ async def chat(
         )
     
     try:
-        response = await client.chat.completions.create(
+        response = await get_client().chat.completions.create(
             model="gpt-4",
             messages=conversation,
             stream=False
@@ -299,28 +318,79 @@ async def handle_feedback(
     elif feedback_type == "bad_answer":
         session_memory[username]["feedback_score"] -= 1
     
-    return {"status": "success", "new_score": session_memory[username]["feedback_score"]}
+    new_score = session_memory[username]["feedback_score"]
+    work_queue.submit("feedback", logger.info, "Feedback from %s: %s (score %.2f)", username, feedback_type, new_score)
+    return {"status": "success", "new_score": new_score}
+
+async def record_grading(rag: Retriever, question: str, retrieval_result) -> None:
+    """Self-grade a retrieval and log the scores"""
+    grade = await rag.grade_retrieval(question, retrieval_result)
+    logger.info(
+        "Self-grading scores - Relevance: %s, Coverage: %s",
+        grade.factual_relevance, grade.answer_coverage
+    )
+
+def record_history(username: str, question: str, answer: str) -> None:
+    """Append a completed exchange to the user's session history"""
+    session = session_memory.get(username)
+    if session is None:
+        return
+    session["history"].extend([
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": answer}
+    ])
+    # Keep history manageable
+    if len(session["history"]) > 10:
+        session["history"] = session["history"][-10:]
 
 async def refine_query(query: str) -> str:
     """Refine the query using GPT-4"""
-    response = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "Refine the following query to be more specific and searchable:"},
-            {"role": "user", "content": query}
-        ]
-    )
+    with metrics.timer("refinement"):
+        response = await get_client().chat.completions.create(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "Refine the following query to be more specific and searchable:"},
+                {"role": "user", "content": query}
+            ]
+        )
     return response.choices[0].message.content
 
-async def stream_response(conversation: List[Dict[str, str]]):
-    """Stream the AI response"""
-    async for chunk in await client.chat.completions.create(
+async def stream_response(conversation: List[Dict[str, str]], on_complete: Optional[Callable[[str], None]] = None):
+    """Stream the AI response
+
+    Args:
+        conversation: Messages to send to the model
+        on_complete: Called with the full answer once streaming has finished
+    """
+    start = perf_counter()
+    first_token = True
+    parts = []
+    async for chunk in await get_client().chat.completions.create(
         model="gpt-4",
         messages=conversation,
         stream=True
     ):
         if chunk and chunk.choices[0].delta.content:
+            if first_token:
+                metrics.observe("llm_ttft", perf_counter() - start)
+                first_token = False
+            parts.append(chunk.choices[0].delta.content)
             yield f"data: {chunk.choices[0].delta.content}\n\n"
+    metrics.observe("llm_total", perf_counter() - start)
+    if on_complete is not None:
+        on_complete("".join(parts))
+
+async def answer_deltas(chat_response: Union[ChatResponse, StreamingResponse]):
+    """Yield the text of a chat answer, whether it was streamed or not"""
+    if not isinstance(chat_response, StreamingResponse):
+        yield chat_response.response
+        return
+    async for event in chat_response.body_iterator:
+        if isinstance(event, bytes):
+            event = event.decode()
+        if event.startswith("data: ") and event.endswith("\n\n"):
+            # Strip only the framing; the delta itself may end in newlines
+            yield event[len("data: "):-2]
 
 def get_system_prompt(feedback_score: float):
     """Get appropriate system prompt based on feedback score"""
@@ -328,51 +398,79 @@ def get_system_prompt(feedback_score: float):
         return "Be more concise and cite sources explicitly."
     return "Maintain current style, user is satisfied."
 
-async def transcribe_audio(audio_file: UploadFile) -> str:
-    """Transcribe audio file to text using speech recognition"""
-    recognizer = sr.Recognizer()
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-        # Write uploaded file to temporary file
-        temp_file.write(await audio_file.read())
-        temp_file.flush()
-        
-        # Use speech recognition
-        with sr.AudioFile(temp_file.name) as source:
-            audio = recognizer.record(source)
-            
-        try:
-            # Try using Whisper first
-            text = recognizer.recognize_whisper(audio)
-        except:
-            # Fallback to Google Speech Recognition
-            text = recognizer.recognize_google(audio)
-        
-        # Clean up temp file
-        os.unlink(temp_file.name)
-        
-        return text
+class BulkTaskOperation(BaseModel):
+    """Single operation in a bulk task request
 
-def text_to_speech(text: str) -> bytes:
-    """Convert text to speech using pyttsx3"""
-    engine = pyttsx3.init()
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-        # Save speech to temporary file
-        engine.save_to_file(text, temp_file.name)
-        engine.runAndWait()
-        
-        # Read audio data
-        with open(temp_file.name, "rb") as f:
-            audio_data = f.read()
-        
-        # Clean up temp file
-        os.unlink(temp_file.name)
-        
-        return audio_data
+    Attributes:
+        op: One of "create", "complete" or "delete"
+        title: Title of the task to create or act on
+        when: When the task is due (create only)
+        description: Detailed description of the task (create only)
+    """
+    op: Literal["create", "complete", "delete"]
+    title: str
+    when: Optional[str] = None
+    description: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_create_fields(self):
+        if self.op == "create" and (self.when is None or self.description is None):
+            raise ValueError("create operations require 'when' and 'description'")
+        return self
+
+class BulkTaskRequest(BaseModel):
+    """Bulk task request model
+
+    Attributes:
+        operations: Operations to apply in order
+        atomic: Apply nothing unless every operation succeeds
+    """
+    operations: List[BulkTaskOperation] = Field(..., min_length=1, max_length=500)
+    atomic: bool = False
+
+class BulkTaskResponse(BaseModel):
+    """Response model for bulk task operations"""
+    status: str
+    results: List[Dict]
+    message: str
+
+@router.post("/tasks/bulk", dependencies=[Depends(rate_limit)])
+async def bulk_tasks(
+    bulk_request: BulkTaskRequest,
+    request: Request,
+    username: str = Depends(get_current_user)
+) -> BulkTaskResponse:
+    """Apply many task operations at once
+
+    The whole batch runs in one critical section and counts as a single
+    request against the rate limit. With ``atomic`` set, a batch containing
+    any operation that would fail is rejected with 409 and nothing changes.
+    """
+    applied, results = await task_manager.apply_bulk(
+        username,
+        [operation.dict() for operation in bulk_request.operations],
+        atomic=bulk_request.atomic
+    )
+    for result in results:
+        if result["task"] is not None:
+            result["task"] = result["task"].dict()
+    failed = sum(1 for result in results if result["status"] == "not_found")
+    if not applied:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content=jsonable_encoder(BulkTaskResponse(
+                status="aborted",
+                results=results,
+                message=f"{failed} of {len(results)} operations would fail; nothing was applied"
+            ))
+        )
+    return BulkTaskResponse(
+        status="success" if not failed else "partial",
+        results=results,
+        message=f"Applied {len(results) - failed} of {len(results)} operations"
+    )
 
-@router.post("/tasks")
-@limiter.limit("30/minute")
+@router.post("/tasks", dependencies=[Depends(rate_limit)])
 async def manage_tasks(
     task_request: TaskRequest,
     request: Request,
@@ -386,22 +484,93 @@ async def manage_tasks(
         message=f"Task '{task.title}' scheduled for {task.when}"
     )
 
-@router.get("/tasks")
-@limiter.limit("30/minute")
+def encode_cursor(task_id: int) -> str:
+    """Encode a task id as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(str(task_id).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a pagination cursor back into a task id"""
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+@router.get("/tasks", dependencies=[Depends(rate_limit)])
 async def list_tasks(
     request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
     username: str = Depends(get_current_user)
 ) -> TaskResponse:
-    """List all tasks"""
-    tasks = await task_manager.list_tasks(username)
+    """List tasks, optionally paginated and filtered
+
+    The response carries an ETag derived from the user's task list version
+    and the query string; a matching If-None-Match is answered with 304
+    before any task is serialized.
+    """
+    query_hash = zlib.crc32(request.url.query.encode())
+    etag = f'W/"{task_manager.version(username)}.{query_hash:08x}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    tasks, next_id = await task_manager.page_tasks(
+        username,
+        after_id=decode_cursor(cursor) if cursor else None,
+        limit=limit,
+        completed=completed,
+        due_after=due_after,
+        due_before=due_before,
+    )
+    response.headers["ETag"] = etag
     return TaskResponse(
         status="success",
         tasks=[task.dict() for task in tasks],
+        next_cursor=encode_cursor(next_id) if next_id is not None else None,
         message=f"Found {len(tasks)} tasks"
     )
 
-@router.post("/tasks/{task_title}/complete")
-@limiter.limit("30/minute")
+@router.get("/tasks/upcoming", dependencies=[Depends(rate_limit)])
+async def upcoming_tasks(
+    request: Request,
+    within: str = "24h",
+    username: str = Depends(get_current_user)
+) -> TaskResponse:
+    """List pending tasks due within a time window (e.g. 90, 30m, 24h, 7d)"""
+    try:
+        window = parse_duration(within)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    tasks = await task_manager.upcoming_tasks(username, window)
+    return TaskResponse(
+        status="success",
+        tasks=[task.dict() for task in tasks],
+        message=f"Found {len(tasks)} tasks due within {within}"
+    )
+
+@router.get("/tasks/reminders", dependencies=[Depends(rate_limit)])
+async def task_reminders(
+    request: Request,
+    username: str = Depends(get_current_user)
+) -> TaskResponse:
+    """Collect reminders for tasks that have become due"""
+    tasks = reminder_scheduler.collect(username)
+    return TaskResponse(
+        status="success",
+        tasks=[task.dict() for task in tasks],
+        message=f"{len(tasks)} tasks are due"
+    )
+
+@router.post("/tasks/{task_title}/complete", dependencies=[Depends(rate_limit)])
 async def complete_task(
     task_title: str,
     request: Request,
@@ -420,8 +589,7 @@ async def complete_task(
         detail=f"Task '{task_title}' not found"
     )
 
-@router.delete("/tasks/{task_title}")
-@limiter.limit("30/minute")
+@router.delete("/tasks/{task_title}", dependencies=[Depends(rate_limit)])
 async def delete_task(
     task_title: str,
     request: Request,
@@ -439,34 +607,80 @@ async def delete_task(
         detail=f"Task '{task_title}' not found"
     )
 
-@router.post("/voice")
-@limiter.limit("30/minute")
+@router.post("/voice", dependencies=[Depends(rate_limit)])
 async def voice_endpoint(
     request: Request,
-    audio: UploadFile = File(...),
-    username: str = Depends(get_current_user)
+    audio: Optional[UploadFile] = File(None),
+    stream: bool = Query(False, description="Stream the spoken answer sentence by sentence"),
+    username: str = Depends(get_current_user),
+    tenant: Optional[str] = Depends(get_current_tenant)
 ):
-    """Voice interface endpoint"""
+    """Voice interface endpoint
+
+    The clip can be sent as a multipart ``audio`` field or as a raw
+    ``audio/*`` request body. A raw body is read from the connection in
+    chunks, capped at VOICE_MAX_UPLOAD_BYTES, and never touches disk.
+
+    With ``stream=true`` the answer is generated as a stream and each
+    sentence is spoken as soon as it is complete, so audio starts playing
+    after roughly one sentence instead of after the whole answer.
+    """
+    limit = settings.VOICE_MAX_UPLOAD_BYTES
+    try:
+        if audio is not None:
+            chunks = voice.iter_upload(audio)
+        elif request.headers.get("content-type", "").startswith("audio/"):
+            if int(request.headers.get("content-length") or 0) > limit:
+                raise voice.AudioTooLarge(f"Audio upload exceeds {limit} bytes")
+            chunks = request.stream()
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Send audio as a multipart 'audio' field or an audio/* body"
+            )
+        data = await voice.read_audio(chunks, limit)
+    except voice.AudioTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
     try:
         # Transcribe audio to text
-        text = await transcribe_audio(audio)
+        with metrics.timer("stt"):
+            text = await voice.transcribe_audio(data)
         
         # Process through chat endpoint
-        message = ChatMessage(message=text)
-        chat_response = await chat(request, message, username)
+        message = ChatMessage(message=text, stream=stream)
+        chat_response = await chat(request, message, username, tenant)
         
-        # Convert response to speech
-        audio_data = await asyncio.get_event_loop().run_in_executor(
-            executor,
-            text_to_speech,
-            chat_response.response
-        )
+        if stream:
+            return StreamingResponse(voice.speak(answer_deltas(chat_response)), media_type="audio/wav")
         
-        return StreamingResponse(
-            io.BytesIO(audio_data),
-            media_type="audio/wav"
-        )
+        # Convert response to speech; cached clips are streamed from disk
+        with metrics.timer("tts"):
+            speech = await voice.open_speech(chat_response.response)
+            if speech is not None:
+                return StreamingResponse(
+                    voice.iter_file(speech),
+                    media_type="audio/wav",
+                    headers={"Content-Length": str(os.fstat(speech.fileno()).st_size)}
+                )
+            # No disk tier, or evicted again before it could be opened
+            audio_data = await voice.synthesize(chat_response.response)
         
+        return Response(content=audio_data, media_type="audio/wav")
+        
+    except (voice.AudioDecodeError, voice.NoSpeechDetected) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except PoolBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
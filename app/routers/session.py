@@ -0,0 +1,279 @@
+"""Persistent WebSocket sessions for chat and voice
+
+A kiosk opens ``/concierge/session`` once and then runs any number of turns
+over it. The token is verified when the connection opens instead of on
+every turn, and each turn is only charged against the user's rate limit.
+A turn started after the token expires closes the connection with 1008.
+
+Text frames carry JSON messages tagged with a client-chosen turn ``id``;
+binary frames carry audio, prefixed with the turn id as a 4-byte
+big-endian integer.
+
+Client to server:
+    ``{"type": "chat", "id": 1, "message": "..."}``
+        Ask a question; the answer is streamed back.
+    ``{"type": "voice", "id": 2, "speak": true}``
+        Transcribe the audio sent for turn 2 and answer it, also as speech
+        when ``speak`` is set.
+    ``{"type": "cancel", "id": 1}``
+        Abandon a turn, or free the id of a turn whose upload was rejected.
+
+Audio for a turn is rejected once it exceeds VOICE_MAX_UPLOAD_BYTES; further
+frames for that id are dropped until it is cancelled. At most
+SESSION_MAX_TURNS uploads can be open or rejected at once, and a client
+starting more is disconnected.
+
+Server to client:
+    ``transcript``, ``delta`` and ``done`` messages with a ``text``, and
+    ``error`` messages with a ``detail`` and, when retrying may help, a
+    ``retry_after``. Spoken answers arrive as binary frames forming one WAV
+    stream per turn.
+"""
+from typing import Awaitable, Callable, Dict, Optional, Set, Union
+from time import perf_counter
+import asyncio
+import json
+import logging
+import math
+import struct
+import time
+
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from jose import JWTError
+
+from ..core.admission import Overloaded, admission_controller
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..core.rate_limit import rate_limiter
+from ..tools import voice
+from ..tools.worker_pool import PoolBusy
+from . import concierge
+from .auth import decode_token, fake_users_db, tenant_of
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+TURN_ID = struct.Struct(">I")
+
+class TurnError(Exception):
+    """Raised to end a turn with an error message to the client"""
+
+    def __init__(self, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+def authenticate(websocket: WebSocket) -> Optional[Dict]:
+    """Claims of a valid token from the ``token`` query parameter or Authorization header"""
+    token = websocket.query_params.get("token")
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    if not token:
+        return None
+    try:
+        claims = decode_token(token)
+    except JWTError:
+        return None
+    return claims if claims.get("sub") in fake_users_db else None
+
+class Session:
+    """One authenticated connection and the turns running on it
+
+    Up to SESSION_MAX_TURNS turns run concurrently. Everything sent to the
+    client goes through a bounded outbox drained by a single writer, so a
+    client that reads slowly holds back the answers being produced for it
+    rather than making them pile up in memory.
+    """
+
+    def __init__(self, websocket: WebSocket, username: str, tenant: Optional[str] = None,
+                 expires_at: Optional[float] = None):
+        self.websocket = websocket
+        self.username = username
+        self.tenant = tenant
+        self.expires_at = expires_at
+        self.outbox: asyncio.Queue = asyncio.Queue(settings.SESSION_SEND_BUFFER)
+        self.turns: Dict[int, asyncio.Task] = {}
+        self.uploads: Dict[int, bytearray] = {}
+        self.rejected: Set[int] = set()
+
+    async def send(self, kind: str, turn_id: int, **fields) -> None:
+        await self.outbox.put(json.dumps({"type": kind, "id": turn_id, **fields}))
+
+    async def send_audio(self, turn_id: int, chunk: bytes) -> None:
+        await self.outbox.put(TURN_ID.pack(turn_id) + chunk)
+
+    async def _write(self) -> None:
+        while True:
+            frame: Union[str, bytes] = await self.outbox.get()
+            if isinstance(frame, bytes):
+                await self.websocket.send_bytes(frame)
+            else:
+                await self.websocket.send_text(frame)
+
+    async def run(self) -> None:
+        writer = asyncio.create_task(self._write())
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.websocket.receive(), settings.SESSION_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await self.websocket.close(code=1000, reason="Idle timeout")
+                    return
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    if not await self._receive_audio(message["bytes"]):
+                        await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Too many uploads")
+                        return
+                elif message.get("text") is not None:
+                    if not await self._dispatch(message["text"]):
+                        await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                        return
+                if writer.done():
+                    # The client stopped reading; nothing more can be sent
+                    return
+        finally:
+            # Turns release their admission slots as they unwind
+            for task in list(self.turns.values()):
+                task.cancel()
+            writer.cancel()
+
+    async def _receive_audio(self, frame: bytes) -> bool:
+        """Buffer an audio frame; False if the client has too many uploads open"""
+        if len(frame) < TURN_ID.size:
+            return True
+        (turn_id,) = TURN_ID.unpack_from(frame)
+        if turn_id in self.rejected:
+            return True
+        upload = self.uploads.get(turn_id)
+        if upload is None:
+            # Rejected ids count too, so a client cannot cycle through ids
+            if len(self.uploads) + len(self.rejected) >= settings.SESSION_MAX_TURNS:
+                return False
+            upload = self.uploads[turn_id] = bytearray()
+        upload += frame[TURN_ID.size:]
+        if len(upload) > settings.VOICE_MAX_UPLOAD_BYTES:
+            del self.uploads[turn_id]
+            self.rejected.add(turn_id)
+            await self.send("error", turn_id, detail=f"Audio upload exceeds {settings.VOICE_MAX_UPLOAD_BYTES} bytes")
+        return True
+
+    async def _dispatch(self, text: str) -> bool:
+        """Handle a JSON message; False if it starts a turn after the token expired"""
+        try:
+            message = json.loads(text)
+            kind, turn_id = message["type"], int(message["id"])
+        except (ValueError, TypeError, KeyError):
+            await self.send("error", None, detail="Messages need a type and an integer id")
+            return True
+        if kind == "cancel":
+            task = self.turns.get(turn_id)
+            if task is not None:
+                task.cancel()
+            self.uploads.pop(turn_id, None)
+            self.rejected.discard(turn_id)
+            return True
+        if kind not in ("chat", "voice"):
+            await self.send("error", turn_id, detail=f"Unknown message type {kind!r}")
+            return True
+        if turn_id in self.turns:
+            await self.send("error", turn_id, detail="Turn id already in use")
+            return True
+        if turn_id in self.rejected:
+            await self.send("error", turn_id, detail="Audio for this turn was rejected; cancel it to reuse the id")
+            return True
+        if self.expires_at is not None and time.time() >= self.expires_at:
+            return False
+        if len(self.turns) >= settings.SESSION_MAX_TURNS:
+            await self.send("error", turn_id, detail="Too many turns in flight", retry_after=1)
+            return True
+        if kind == "chat":
+            text = str(message.get("message", ""))
+            work = lambda: self._chat(turn_id, text)
+        else:
+            data, speak = bytes(self.uploads.pop(turn_id, b"")), bool(message.get("speak"))
+            work = lambda: self._voice(turn_id, data, speak)
+        task = asyncio.create_task(self._turn(turn_id, work))
+        self.turns[turn_id] = task
+        task.add_done_callback(lambda _: self.turns.pop(turn_id, None))
+        return True
+
+    async def _turn(self, turn_id: int, work: Callable[[], Awaitable[None]]) -> None:
+        """Run one turn under the rate limit and admission control"""
+        try:
+            decision = await asyncio.get_running_loop().run_in_executor(None, rate_limiter.acquire, self.username)
+            if not decision.allowed:
+                raise TurnError("Rate limit exceeded", decision.retry_after)
+            admitted = settings.ADMISSION_MAX_CONCURRENCY > 0
+            if admitted:
+                try:
+                    await admission_controller.acquire()
+                except Overloaded as e:
+                    raise TurnError("Server is busy, please retry later", e.retry_after) from None
+            start = perf_counter()
+            service_time = None
+            try:
+                with metrics.timer("session_turn"):
+                    await work()
+                service_time = perf_counter() - start
+            finally:
+                if admitted:
+                    # As for HTTP requests, only successful turns update the estimate
+                    admission_controller.release(service_time)
+        except TurnError as e:
+            await self._fail(turn_id, e.detail, e.retry_after)
+        except (voice.AudioDecodeError, voice.NoSpeechDetected) as e:
+            await self._fail(turn_id, str(e))
+        except PoolBusy as e:
+            await self._fail(turn_id, str(e), 1)
+        except HTTPException as e:
+            await self._fail(turn_id, str(e.detail))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Session turn %s for %s failed", turn_id, self.username)
+            await self._fail(turn_id, "Internal error")
+
+    async def _fail(self, turn_id: int, detail: str, retry_after: Optional[float] = None) -> None:
+        fields = {"detail": detail}
+        if retry_after is not None:
+            fields["retry_after"] = max(1, math.ceil(retry_after))
+        await self.send("error", turn_id, **fields)
+
+    async def _answer(self, turn_id: int, text: str):
+        """Yield the answer to ``text`` while streaming it to the client"""
+        response = await concierge.chat(self.websocket, concierge.ChatMessage(message=text, stream=True),
+                                        self.username, self.tenant)
+        parts = []
+        async for delta in concierge.answer_deltas(response):
+            parts.append(delta)
+            await self.send("delta", turn_id, text=delta)
+            yield delta
+        await self.send("done", turn_id, text="".join(parts))
+
+    async def _chat(self, turn_id: int, text: str) -> None:
+        async for _ in self._answer(turn_id, text):
+            pass
+
+    async def _voice(self, turn_id: int, data: bytes, speak: bool) -> None:
+        if not data:
+            raise TurnError("No audio was sent for this turn")
+        with metrics.timer("stt"):
+            text = await voice.transcribe_audio(data)
+        await self.send("transcript", turn_id, text=text)
+        if not speak:
+            return await self._chat(turn_id, text)
+        async for chunk in voice.speak(self._answer(turn_id, text)):
+            await self.send_audio(turn_id, chunk)
+
+@router.websocket("/session")
+async def session_endpoint(websocket: WebSocket):
+    """Persistent chat and voice session; see the module docstring for the protocol"""
+    claims = authenticate(websocket)
+    if claims is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    await websocket.accept()
+    metrics.inc("concierge_sessions_total", help="WebSocket sessions opened")
+    await Session(websocket, claims["sub"], tenant_of(claims["sub"]), claims.get("exp")).run()
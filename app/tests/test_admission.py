@@ -0,0 +1,37 @@
+"""Tests for admission control"""
+import asyncio
+
+import pytest
+
+from ..core.admission import AdmissionController, Overloaded
+
+@pytest.mark.asyncio
+async def test_sheds_requests_that_would_miss_the_deadline():
+    """Test that arrivals are rejected once the estimated wait exceeds the deadline"""
+    controller = AdmissionController(capacity=1, deadline=1.5, initial_service_time=1.0)
+    await controller.acquire()
+
+    # One second ahead of it: queues
+    queued = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    # Two seconds ahead of it: shed immediately
+    with pytest.raises(Overloaded) as excinfo:
+        await controller.acquire()
+    assert excinfo.value.retry_after == 2.0
+
+    controller.release(service_time=1.0)
+    await queued
+    assert controller.in_flight == 1
+    controller.release()
+    assert controller.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_queued_request_times_out_at_deadline():
+    """Test that a waiter that never gets a slot is rejected and leaves the queue"""
+    controller = AdmissionController(capacity=1, deadline=0.05, initial_service_time=0.01)
+    await controller.acquire()
+    with pytest.raises(Overloaded):
+        await controller.acquire()
+    controller.release()
+    await controller.acquire()
+    assert controller.in_flight == 1
@@ -0,0 +1,71 @@
+"""Tests for the content-addressed audio cache"""
+import asyncio
+import os
+
+import pytest
+
+from ..tools.audio_cache import AudioCache
+
+@pytest.mark.asyncio
+async def test_tiers_evict_least_recently_used_within_budget(tmp_path):
+    """Test that both tiers stay within their byte budgets and the disk tier survives restarts"""
+    cache = AudioCache("test", str(tmp_path), memory_bytes=20, disk_bytes=30)
+    keys = [cache.key(f"phrase {i}", voice="default") for i in range(4)]
+    assert len(set(keys)) == 4
+    assert cache.key("phrase 0", voice="other") != keys[0]
+
+    for key in keys[:3]:
+        await cache.put(key, b"x" * 10)
+    # Touch the oldest clip so the second one is evicted instead
+    assert await cache.get(keys[0]) == b"x" * 10
+    await cache.put(keys[3], b"y" * 10)
+
+    assert await cache.path(keys[1]) is None
+    assert all([await cache.path(key) for key in (keys[0], keys[2], keys[3])])
+    assert sum(os.path.getsize(tmp_path / f) for f in os.listdir(tmp_path)) <= 30
+    assert sum(len(data) for data in cache._memory.values()) <= 20
+
+    restarted = AudioCache("test", str(tmp_path), memory_bytes=20, disk_bytes=30)
+    assert await restarted.get(keys[3]) == b"y" * 10
+    assert await restarted.get(keys[1]) is None
+
+@pytest.mark.asyncio
+async def test_disk_budget_holds_across_workers(tmp_path):
+    """Test that workers sharing a directory keep it within one disk budget"""
+    workers = [AudioCache("test", str(tmp_path), memory_bytes=0, disk_bytes=30, rescan_interval=0) for _ in range(2)]
+    for i in range(4):
+        for n, cache in enumerate(workers):
+            await cache.put(cache.key(f"worker {n} phrase {i}"), b"x" * 10)
+            assert sum(os.path.getsize(tmp_path / f) for f in os.listdir(tmp_path)) <= 30
+
+@pytest.mark.asyncio
+async def test_opened_clips_survive_eviction_by_another_worker(tmp_path):
+    """Test that an opened clip stays readable and a vanished one is reported missing"""
+    cache = AudioCache("test", str(tmp_path), memory_bytes=0, disk_bytes=1024)
+    key = cache.key("hello")
+    await cache.put(key, b"audio")
+
+    with await cache.open(key) as f:
+        os.unlink(tmp_path / f"{key}.wav")
+        assert f.read() == b"audio"
+    assert await cache.open(key) is None
+    assert await cache.path(key) is None
+    assert cache._disk_size == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_render_once():
+    """Test that simultaneous requests for the same clip share one render"""
+    cache = AudioCache("test", None, memory_bytes=1024, disk_bytes=0)
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0.01)
+        return b"audio"
+
+    key = cache.key("hello")
+    results = await asyncio.gather(*(cache.get_or_render(key, render) for _ in range(5)))
+    assert results == [b"audio"] * 5
+    assert len(renders) == 1
+    assert await cache.get_or_render(key, render) == b"audio"
+    assert len(renders) == 1
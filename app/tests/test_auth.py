@@ -0,0 +1,110 @@
+"""Tests for authentication"""
+import sqlite3
+import time
+import pytest
+from fastapi import HTTPException
+from ..core.rate_limit import TokenBucketLimiter
+from ..routers import auth
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_in_pool():
+    """Test hashing and verification through the password worker pool"""
+    hashed = await auth.get_password_hash("s3cret")
+    assert hashed != "s3cret"
+    assert await auth.verify_password("s3cret", hashed)
+    assert not await auth.verify_password("wrong", hashed)
+
+def test_token_cache_expires_with_token():
+    """Test that cached claims are dropped at the token's exp"""
+    cache = auth.VerifiedTokenCache(max_size=2)
+    now = time.time()
+    cache.put("live", {"sub": "alice", "exp": now + 60})
+    cache.put("expired", {"sub": "bob", "exp": now - 1})
+    assert cache.get("live")["sub"] == "alice"
+    assert cache.get("expired") is None
+
+    cache.put("other", {"sub": "carol", "exp": now + 60})
+    cache.put("newest", {"sub": "dave", "exp": now + 60})
+    assert cache.get("live") is None  # evicted as least recently used
+    assert cache.get("newest")["sub"] == "dave"
+
+@pytest.mark.asyncio
+async def test_get_current_user_uses_cache(monkeypatch):
+    """Test that a verified token is not decoded again"""
+    auth.fake_users_db["cached_user"] = "hash"
+    token = auth.create_access_token({"sub": "cached_user"})
+    assert await auth.get_current_user(token) == "cached_user"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("token decoded twice")
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert await auth.get_current_user(token) == "cached_user"
+
+    del auth.fake_users_db["cached_user"]
+    with pytest.raises(HTTPException):
+        await auth.get_current_user(token)
+
+def test_token_bucket_shared_between_limiters(tmp_path):
+    """Test that limiters on the same database share per-user buckets"""
+    path = str(tmp_path / "buckets.sqlite3")
+    worker_a = TokenBucketLimiter(path, capacity=2, refill_per_second=0.5)
+    worker_b = TokenBucketLimiter(path, capacity=2, refill_per_second=0.5)
+
+    assert worker_a.acquire("alice", now=100.0).allowed
+    assert worker_b.acquire("alice", now=100.0).allowed
+    denied = worker_a.acquire("alice", now=100.5)
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(1.5)
+
+    # Other users have their own bucket
+    assert worker_b.acquire("bob", now=100.5).allowed
+    # Tokens refill over time
+    assert worker_b.acquire("alice", now=102.5).allowed
+
+def test_token_bucket_fails_open_when_locked(tmp_path):
+    """Test that a database held by another worker lets requests through"""
+    path = str(tmp_path / "buckets.sqlite3")
+    limiter = TokenBucketLimiter(path, capacity=1, refill_per_second=0.01, busy_timeout=0.05)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert limiter.acquire("alice", now=100.0).allowed
+        assert limiter.acquire("alice", now=100.0).allowed
+    finally:
+        other.execute("ROLLBACK")
+    assert limiter.acquire("alice", now=100.0).allowed
+    assert not limiter.acquire("alice", now=100.0).allowed
+
+@pytest.mark.asyncio
+async def test_tenant_is_assigned_by_operator_only(monkeypatch):
+    """Test that a tenant asked for at registration is ignored"""
+    monkeypatch.setattr(auth.settings, "USER_TENANTS", "alice:bakery, bob : garage,broken")
+    monkeypatch.setattr(auth.settings, "PROVISIONED_USERS", "alice:hash")
+    assert auth.user_tenants() == {"alice": "bakery", "bob": "garage"}
+
+    response = await auth.register(auth.User.model_validate({"username": "mallory", "password": "p", "tenant": "bakery"}))
+    try:
+        assert "tenant" not in auth.decode_token(response["access_token"])
+        assert await auth.get_current_tenant("mallory") is None
+        assert await auth.get_current_tenant("alice") == "bakery"
+    finally:
+        del auth.fake_users_db["mallory"]
+
+@pytest.mark.asyncio
+async def test_mapped_names_cannot_be_registered_after_restart(monkeypatch):
+    """Test that registering a tenant's username on a fresh user store grants nothing"""
+    hashed = await auth.get_password_hash("operator-set")
+    monkeypatch.setattr(auth.settings, "USER_TENANTS", "alice:bakery,bob:garage")
+    monkeypatch.setattr(auth.settings, "PROVISIONED_USERS", f"alice:{hashed}")
+    # A restart starts from an empty store plus the provisioned accounts
+    monkeypatch.setattr(auth, "fake_users_db", {})
+    auth.load_provisioned_users()
+
+    for name in ("alice", "bob"):
+        with pytest.raises(HTTPException) as refused:
+            await auth.register(auth.User(username=name, password="mine"))
+        assert refused.value.status_code == 403
+    # bob is mapped but not provisioned, so nobody holds his tenant
+    assert await auth.get_current_tenant("bob") is None
+    assert await auth.verify_password("operator-set", auth.fake_users_db["alice"])
+    assert await auth.get_current_tenant("alice") == "bakery"
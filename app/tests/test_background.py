@@ -0,0 +1,40 @@
+"""Tests for the background work queue"""
+import asyncio
+
+import pytest
+
+from ..core.background import WorkQueue
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_order_and_overflow_is_dropped():
+    """Test that queued jobs run after submit returns and a full queue drops jobs"""
+    queue = WorkQueue(max_size=2, workers=1)
+    queue.start()
+    done = []
+
+    async def job(n):
+        await asyncio.sleep(0)
+        done.append(n)
+
+    assert queue.submit("test", job, 1)
+    assert queue.submit("test", done.append, 2)
+    assert not queue.submit("test", job, 3)
+    assert done == []
+
+    await queue.stop()
+    assert done == [1, 2]
+
+@pytest.mark.asyncio
+async def test_failing_job_does_not_stop_worker():
+    """Test that an exception in one job leaves the worker running"""
+    queue = WorkQueue(max_size=10, workers=1)
+    queue.start()
+    done = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    queue.submit("test", fail)
+    queue.submit("test", done.append, "after")
+    await queue.stop()
+    assert done == ["after"]
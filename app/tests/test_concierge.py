@@ -1,4 +1,7 @@
 import pytest
+import subprocess
+import sys
+import time
 from fastapi.testclient import TestClient
 from ..main import app
 from ..tools.retrieve_docs import DocumentRetriever
@@ -23,6 +26,30 @@ def test_health_check():
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
+def test_ready_after_warm_up(monkeypatch):
+    """Test that /ready fails until the lifespan warm-up has finished"""
+    monkeypatch.setattr(app.state, "ready", False, raising=False)
+    assert client.get("/ready").status_code == 503
+
+    monkeypatch.setattr("app.main.settings.TASK_STORE_DIR", "")
+    # Loading the Whisper and TTS worker pools is not what this checks
+    monkeypatch.setattr("app.main.settings.ENABLE_VOICE_SERVICE", False)
+    with TestClient(app) as started:
+        for _ in range(600):
+            if app.state.ready:
+                break
+            time.sleep(0.05)
+        assert started.get("/ready").json() == {"status": "ready"}
+
+def test_import_defers_heavy_modules():
+    """Test that importing the app does not load the LLM, vector store or voice stacks"""
+    code = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('openai', 'chromadb', 'speech_recognition', 'pyttsx3') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
 def test_chat_endpoint(auth_headers):
     """Test chat endpoint"""
     response = client.post(
@@ -0,0 +1,105 @@
+"""Tests for hybrid lexical and vector retrieval"""
+import asyncio
+import time
+
+import pytest
+
+from ..models.rag import Document, RetrievalConfig, RetrievalResult
+from ..tools.retrieve_docs import DocumentRetriever, HybridRetriever
+
+class FakeEngine:
+    def __init__(self, sources, delay=0.0, error=None):
+        self.sources = sources
+        self.delay = delay
+        self.error = error
+        self.config = RetrievalConfig()
+
+    def score_docs(self, query):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [({"content": s, "source": s}, 1.0) for s in self.sources]
+
+    async def retrieve_docs(self, query, k=3, max_distance=None):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return RetrievalResult(query=query, docs=[Document(content=s, source=s) for s in self.sources[:k]])
+
+@pytest.mark.asyncio
+async def test_rankings_are_fused_by_reciprocal_rank():
+    """Test that documents ranked well by both engines come first"""
+    hybrid = HybridRetriever(FakeEngine(["a", "b", "c"]), FakeEngine(["a", "d", "c"]), deadline=1.0)
+    result = await hybrid.retrieve_docs("query", k=3)
+    assert [doc.source for doc in result.docs] == ["a", "c", "b"]
+
+@pytest.mark.asyncio
+async def test_slow_or_failing_engine_is_left_out():
+    """Test that retrieval degrades to whichever engine answers within the deadline"""
+    slow = HybridRetriever(FakeEngine(["a", "b"]), FakeEngine(["z"], delay=5.0), deadline=0.05)
+    start = asyncio.get_running_loop().time()
+    result = await slow.retrieve_docs("query", k=2)
+    assert asyncio.get_running_loop().time() - start < 1.0
+    assert [doc.source for doc in result.docs] == ["a", "b"]
+
+    broken = HybridRetriever(FakeEngine(["a"], error=RuntimeError("down")), FakeEngine(["z"]), deadline=1.0)
+    assert [doc.source for doc in (await broken.retrieve_docs("query")).docs] == ["z"]
+
+    late = HybridRetriever(FakeEngine(["a"], delay=0.1), FakeEngine(["z"], delay=5.0), deadline=0.01)
+    assert [doc.source for doc in (await late.retrieve_docs("query")).docs] == ["a"]
+
+@pytest.mark.asyncio
+async def test_lexical_scoring_runs_off_the_event_loop():
+    """Test that slow lexical scoring neither blocks the loop nor escapes the deadline"""
+    hybrid = HybridRetriever(FakeEngine(["a"], delay=0.5), FakeEngine(["z"]), deadline=0.05)
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    start = time.perf_counter()
+    result = await hybrid.retrieve_docs("query")
+    ticker.cancel()
+    assert time.perf_counter() - start < 0.3
+    assert [doc.source for doc in result.docs] == ["z"]
+    assert len(ticks) >= 3
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def get(self, include):
+        return {"ids": list(self.docs)}
+
+    def delete(self, ids):
+        for doc_id in ids:
+            del self.docs[doc_id]
+
+    def add(self, ids, documents, metadatas):
+        self.docs.update(zip(ids, documents))
+
+    def query(self, query_texts, n_results):
+        ids = list(self.docs)[:n_results]
+        return {
+            "documents": [[self.docs[doc_id] for doc_id in ids]],
+            "metadatas": [[{"source": doc_id} for doc_id in ids]],
+            "distances": [[0.5 * i for i in range(len(ids))]],
+        }
+
+@pytest.mark.asyncio
+async def test_vector_collection_sync_and_distance_cutoff():
+    """Test that syncing only adds and removes changed documents and far results are dropped"""
+    retriever = DocumentRetriever()
+    retriever._collection = collection = FakeCollection()
+    docs = [{"content": f"fact {i}", "source": "guide", "metadata": {"topic": "t", "tags": ["x"]}} for i in range(3)]
+    assert await retriever.sync(docs) == 3
+    assert await retriever.sync(docs) == 0
+    assert await retriever.sync(docs[1:] + [{"content": "fact 3", "source": "guide"}]) == 2
+    assert sorted(collection.docs.values()) == ["fact 1", "fact 2", "fact 3"]
+
+    result = await retriever.retrieve_docs("query", k=3, max_distance=0.6)
+    assert len(result.docs) == 2
+    assert len((await retriever.retrieve_docs("query", k=3)).docs) == 3
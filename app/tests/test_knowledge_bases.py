@@ -0,0 +1,72 @@
+"""Tests for per-tenant knowledge bases"""
+import asyncio
+import json
+
+import pytest
+
+from ..tools import knowledge_bases as kb
+from ..tools.knowledge_bases import KnowledgeBaseRegistry, UnknownTenant
+
+def write_kb(path, topic, docs=20):
+    documents = [
+        {"content": f"{topic} fact number {i}", "source": f"{topic} guide", "metadata": {"topic": topic}}
+        for i in range(docs)
+    ]
+    path.write_text(json.dumps({"documents": documents}))
+
+@pytest.fixture
+def registry(tmp_path):
+    write_kb(tmp_path / "default.json", "general")
+    for tenant in ("bakery", "garage", "salon"):
+        write_kb(tmp_path / f"{tenant}.json", tenant)
+    one_kb = kb.estimate_size(json.loads((tmp_path / "bakery.json").read_text())["documents"])
+    # Room for two tenants' indexes but not three
+    return KnowledgeBaseRegistry(str(tmp_path), str(tmp_path / "default.json"), memory_budget=int(one_kb * 2.5))
+
+@pytest.mark.asyncio
+async def test_tenants_load_once_and_evict_least_recently_used(registry, monkeypatch):
+    """Test that concurrent cold requests share a load and the budget evicts LRU"""
+    loads = []
+    read = registry._read
+
+    def counting_read(path):
+        loads.append(path)
+        return read(path)
+
+    monkeypatch.setattr(registry, "_read", counting_read)
+    bakeries = await asyncio.gather(*(registry.get("bakery") for _ in range(10)))
+    assert len(loads) == 1 and all(rag is bakeries[0] for rag in bakeries)
+    result = await bakeries[0].retrieve_docs("bakery fact")
+    assert result.docs and all(doc.source == "bakery guide" for doc in result.docs)
+
+    await registry.get("garage")
+    await registry.get("bakery")
+    await registry.get("salon")
+    assert list(registry._loaded) == ["bakery", "salon"]
+    assert registry.loaded_bytes <= registry.memory_budget
+
+    await registry.get("garage")
+    assert len(loads) == 4
+
+@pytest.mark.asyncio
+async def test_unknown_tenants_are_rejected(registry):
+    """Test that missing or malformed tenant ids do not reach the filesystem"""
+    assert (await registry.get()).knowledge_base[0]["source"] == "general guide"
+    for tenant in ("florist", "../default", ""):
+        with pytest.raises(UnknownTenant):
+            await registry.get(tenant)
+
+@pytest.mark.asyncio
+async def test_tuned_retrieval_config_is_applied(tmp_path):
+    """Test that a tuned config file sets k and the relevance threshold of loaded knowledge bases"""
+    write_kb(tmp_path / "default.json", "general")
+    tuned = tmp_path / "retrieval_config.json"
+    tuned.write_text(json.dumps({"config": {"engine": "lexical", "k": 5, "min_score": 0.0}, "metrics": {}}))
+    config = kb.load_retrieval_config(str(tuned))
+    assert (config.k, config.min_score) == (5, 0.0)
+    assert kb.load_retrieval_config(str(tmp_path / "missing.json")).k == 3
+
+    registry = KnowledgeBaseRegistry(str(tmp_path), str(tmp_path / "default.json"), 2**30, config)
+    rag = await registry.get()
+    result = await rag.retrieve_docs("general fact number")
+    assert len(result.docs) == 5
@@ -0,0 +1,47 @@
+"""Tests for metrics collection"""
+import os
+import subprocess
+import sys
+
+from ..core.metrics import MetricsRegistry
+
+def test_histograms_aggregate_across_workers(tmp_path):
+    """Test that a scrape sums the state written by every worker"""
+    worker_a = MetricsRegistry(str(tmp_path), worker_id="a")
+    worker_b = MetricsRegistry(str(tmp_path), worker_id="b")
+
+    worker_a.observe("retrieval", 0.003)
+    worker_a.observe("retrieval", 0.2)
+    worker_b.observe("retrieval", 0.004)
+    worker_b.inc("requests_total", 2)
+    with worker_b.timer("grading"):
+        pass
+    worker_b.flush()
+
+    text = worker_a.render()
+    assert 'concierge_stage_seconds_bucket{stage="retrieval",le="0.005"} 2' in text
+    assert 'concierge_stage_seconds_bucket{stage="retrieval",le="+Inf"} 3' in text
+    assert 'concierge_stage_seconds_count{stage="retrieval"} 3' in text
+    assert 'concierge_stage_seconds_count{stage="grading"} 1' in text
+    assert "requests_total 2.0" in text
+
+def test_exited_workers_keep_counters_but_not_gauges(tmp_path):
+    """Test that a dead worker's file is folded into the totals without its gauges"""
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    dead = MetricsRegistry(str(tmp_path), worker_id=str(exited.pid))
+    dead.inc("requests_total", 3)
+    dead.observe("retrieval", 0.003)
+    dead.set_gauge("sessions_open", 5)
+    dead.flush()
+
+    live = MetricsRegistry(str(tmp_path))
+    live.inc("requests_total", 1)
+    live.set_gauge("sessions_open", 2)
+
+    for _ in range(2):
+        text = live.render()
+        assert "sessions_open 2" in text
+        assert "requests_total 4.0" in text
+        assert 'concierge_stage_seconds_count{stage="retrieval"} 1' in text
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["merged.json", f"worker-{os.getpid()}.json"]
@@ -0,0 +1,58 @@
+"""Tests for on-demand request profiling"""
+import time
+
+import pytest
+
+from ..core.profiling import ProfileStore, ProfilingMiddleware, admin_users, settings
+from ..routers.auth import create_access_token
+
+async def slow_app(scope, receive, send):
+    time.sleep(0.05)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+async def call(middleware, headers, query=b""):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/slow", "query_string": query, "headers": headers}
+    await middleware(scope, None, send)
+    return dict(sent[0]["headers"])
+
+@pytest.mark.asyncio
+async def test_only_admin_requests_are_profiled(tmp_path):
+    """Test that a flagged admin request stores folded stacks and others are untouched"""
+    store = ProfileStore(str(tmp_path), max_profiles=1)
+    middleware = ProfilingMiddleware(slow_app, store, admins={"admin"}, interval=0.001)
+    admin = b"Bearer " + create_access_token({"sub": "admin"}).encode()
+    user = b"Bearer " + create_access_token({"sub": "user"}).encode()
+
+    assert b"x-profile-id" not in await call(middleware, [(b"authorization", admin)])
+    assert b"x-profile-id" not in await call(middleware, [(b"x-profile", b"1"), (b"authorization", user)])
+    assert store.list() == []
+
+    headers = await call(middleware, [(b"x-profile", b"1"), (b"authorization", admin)])
+    profile_id = headers[b"x-profile-id"].decode()
+    folded = store.get(profile_id)
+    assert "slow_app (test_profiling.py" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+    assert store.list()[0]["path"] == "/slow"
+
+    await call(middleware, [(b"x-profile", b"1"), (b"authorization", admin)])
+    assert len(store.list()) == 1
+    assert store.get(profile_id) is None
+
+@pytest.mark.asyncio
+async def test_profile_flag_and_admins_are_parsed_strictly(tmp_path, monkeypatch):
+    """Test that only an exact profile=1 flags a request and admins must be provisioned"""
+    middleware = ProfilingMiddleware(slow_app, ProfileStore(str(tmp_path)), admins={"admin"}, interval=0.001)
+    admin = [(b"authorization", b"Bearer " + create_access_token({"sub": "admin"}).encode())]
+    for query in (b"noprofile=1", b"profile=10", b"x=profile=1"):
+        assert b"x-profile-id" not in await call(middleware, admin, query)
+    assert b"x-profile-id" in await call(middleware, admin, b"a=b&profile=1")
+
+    monkeypatch.setattr(settings, "ADMIN_USERS", "admin, squatter")
+    monkeypatch.setattr(settings, "PROVISIONED_USERS", "admin:hash")
+    assert admin_users() == {"admin"}
@@ -0,0 +1,77 @@
+"""Tests for the WebSocket session endpoint"""
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from ..core.config import settings
+from ..main import app
+from ..routers import session
+from ..routers.auth import decode_token
+from ..routers.session import TURN_ID
+
+client = TestClient(app)
+
+@pytest.fixture
+def token():
+    """Register a user for the session tests and return their token"""
+    response = client.post("/register", json={"username": "sessionuser", "password": "testpass"})
+    if response.status_code != 200:
+        response = client.post("/login", data={"username": "sessionuser", "password": "testpass"})
+    return response.json()["access_token"]
+
+def test_session_requires_token():
+    """Test that connections without a valid token are refused"""
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/concierge/session?token=invalid"):
+            pass
+    assert refused.value.code == 1008
+
+def test_expired_token_ends_the_session(token, monkeypatch):
+    """Test that a turn started after the token expires closes the connection"""
+    expires_at = decode_token(token)["exp"]
+    with client.websocket_connect(f"/concierge/session?token={token}") as ws:
+        ws.send_json({"type": "chat", "id": 1, "message": "/good_answer"})
+        assert ws.receive_json()["type"] == "delta"
+        assert ws.receive_json()["type"] == "done"
+
+        monkeypatch.setattr(session, "time", types.SimpleNamespace(time=lambda: expires_at))
+        ws.send_json({"type": "chat", "id": 2, "message": "/good_answer"})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
+
+def test_turns_share_one_connection(token):
+    """Test that several turns run over one authenticated connection"""
+    with client.websocket_connect(f"/concierge/session?token={token}") as ws:
+        ws.send_json({"type": "chat", "id": 1, "message": "/good_answer"})
+        assert ws.receive_json() == {"type": "delta", "id": 1, "text": "Thank you for the positive feedback!"}
+        assert ws.receive_json() == {"type": "done", "id": 1, "text": "Thank you for the positive feedback!"}
+
+        ws.send_json({"type": "voice", "id": 2})
+        assert ws.receive_json() == {"type": "error", "id": 2, "detail": "No audio was sent for this turn"}
+
+        ws.send_json({"type": "shout", "id": 3})
+        assert ws.receive_json()["detail"] == "Unknown message type 'shout'"
+
+def test_rejected_upload_stays_rejected(token, monkeypatch):
+    """Test that audio past the cap is not resumed and open uploads are bounded"""
+    monkeypatch.setattr(settings, "VOICE_MAX_UPLOAD_BYTES", 8)
+    monkeypatch.setattr(settings, "SESSION_MAX_TURNS", 2)
+    with client.websocket_connect(f"/concierge/session?token={token}") as ws:
+        ws.send_bytes(TURN_ID.pack(1) + b"x" * 9)
+        assert ws.receive_json() == {"type": "error", "id": 1, "detail": "Audio upload exceeds 8 bytes"}
+        ws.send_bytes(TURN_ID.pack(1) + b"tail")
+        ws.send_json({"type": "voice", "id": 1})
+        assert "rejected" in ws.receive_json()["detail"]
+
+        ws.send_json({"type": "cancel", "id": 1})
+        ws.send_json({"type": "voice", "id": 1})
+        assert ws.receive_json()["detail"] == "No audio was sent for this turn"
+
+        ws.send_bytes(TURN_ID.pack(2) + b"x")
+        ws.send_bytes(TURN_ID.pack(3) + b"x")
+        with pytest.raises(WebSocketDisconnect):
+            ws.send_bytes(TURN_ID.pack(4) + b"x")
+            ws.receive_json()
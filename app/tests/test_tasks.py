@@ -0,0 +1,243 @@
+"""Tests for the task manager"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from ..tools.manage_tasks import TaskManager
+from ..tools.reminders import ReminderScheduler
+from ..tools.schedule import parse_duration, parse_when
+from ..tools.task_store import TaskStore
+
+@pytest.mark.asyncio
+async def test_duplicate_titles_resolve_oldest_first():
+    """Test that title lookups hit the oldest task carrying the title"""
+    manager = TaskManager()
+    first = await manager.add_task("alice", {"title": "AI Demo", "when": "monday at 3pm", "description": "a"})
+    second = await manager.add_task("alice", {"title": "AI Demo", "when": "friday at 3pm", "description": "b"})
+
+    completed = await manager.complete_task("alice", "AI Demo")
+    assert completed.id == first.id
+    assert completed.completed
+
+    assert await manager.remove_task("alice", "AI Demo")
+    tasks = await manager.list_tasks("alice")
+    assert [t.id for t in tasks] == [second.id]
+
+    assert await manager.remove_task("alice", "AI Demo")
+    assert not await manager.remove_task("alice", "AI Demo")
+    assert await manager.complete_task("alice", "AI Demo") is None
+
+@pytest.mark.asyncio
+async def test_list_tasks_returns_snapshot():
+    """Test that listed tasks are unaffected by later writes"""
+    manager = TaskManager()
+    await manager.add_task("bob", {"title": "Call", "when": "today at 9am", "description": "c"})
+    snapshot = await manager.list_tasks("bob")
+
+    await manager.complete_task("bob", "Call")
+    await manager.add_task("bob", {"title": "Email", "when": "today at 10am", "description": "e"})
+
+    assert len(snapshot) == 1
+    assert snapshot[0].completed is False
+    assert len(await manager.list_tasks("bob")) == 2
+    assert await manager.list_tasks("nobody") == ()
+
+@pytest.mark.asyncio
+async def test_users_are_isolated():
+    """Test that users never see each other's tasks"""
+    manager = TaskManager(lock_stripes=1)
+    await manager.add_task("alice", {"title": "Same", "when": "today", "description": "a"})
+    assert not await manager.remove_task("bob", "Same")
+    assert len(await manager.list_tasks("alice")) == 1
+
+@pytest.mark.asyncio
+async def test_tasks_survive_restart(tmp_path):
+    """Test that journaled tasks are restored by a fresh manager"""
+    manager = TaskManager()
+    assert manager.open_store(TaskStore(str(tmp_path), fsync_interval=0.01))
+    await manager.add_task("alice", {"title": "Demo", "when": "monday at 3pm", "description": "d"})
+    await manager.add_task("alice", {"title": "Call", "when": "tuesday at 9am", "description": "c"})
+    await manager.complete_task("alice", "Demo")
+    await manager.remove_task("alice", "Call")
+    await manager.close_store()
+
+    restored = TaskManager()
+    assert restored.open_store(TaskStore(str(tmp_path)))
+    tasks = await restored.list_tasks("alice")
+    assert [(t.title, t.completed) for t in tasks] == [("Demo", True)]
+
+    # Ids keep increasing across restarts
+    new_task = await restored.add_task("alice", {"title": "Next", "when": "today", "description": "n"})
+    assert new_task.id > tasks[0].id
+    await restored.close_store()
+
+@pytest.mark.asyncio
+async def test_snapshot_compacts_journal(tmp_path):
+    """Test that compaction truncates the journal without losing state"""
+    store = TaskStore(str(tmp_path), fsync_interval=0)
+    manager = TaskManager()
+    assert manager.open_store(store)
+    for i in range(5):
+        await manager.add_task("bob", {"title": f"Task {i}", "when": "today", "description": ""})
+    await store.compact()
+    await manager.remove_task("bob", "Task 0")
+    await manager.close_store()
+
+    assert len(store.journal_path.read_text().splitlines()) == 1
+
+    restored = TaskManager()
+    assert restored.open_store(TaskStore(str(tmp_path)))
+    assert [t.title for t in await restored.list_tasks("bob")] == [f"Task {i}" for i in range(1, 5)]
+    await restored.close_store()
+
+@pytest.mark.asyncio
+async def test_failed_snapshot_keeps_queued_records(tmp_path, monkeypatch):
+    """Test that records queued before a failed snapshot are journaled, not dropped"""
+    store = TaskStore(str(tmp_path), fsync_interval=60)
+    manager = TaskManager()
+    assert manager.open_store(store)
+    await manager.add_task("carol", {"title": "Kept", "when": "today", "description": ""})
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(store, "_write_snapshot", fail)
+    with pytest.raises(OSError):
+        await store.compact()
+    assert store._records_since_snapshot == 1
+    monkeypatch.undo()
+    await manager.close_store()
+
+    restored = TaskManager()
+    assert restored.open_store(TaskStore(str(tmp_path)))
+    assert [t.title for t in await restored.list_tasks("carol")] == ["Kept"]
+    await restored.close_store()
+
+def test_parse_when():
+    """Test resolving free-form schedule strings"""
+    now = datetime(2026, 10, 19, 12, 0)  # a Monday
+    assert parse_when("tomorrow at 3pm", now) == datetime(2026, 10, 20, 15, 0)
+    assert parse_when("tomorrow 3pm", now) == datetime(2026, 10, 20, 15, 0)
+    assert parse_when("friday 10:30 am", now) == datetime(2026, 10, 23, 10, 30)
+    assert parse_when("monday at 10am", now) == datetime(2026, 10, 26, 10, 0)
+    assert parse_when("at 9am", now) == datetime(2026, 10, 20, 9, 0)
+    assert parse_when("2025-05-20T15:00:00", now) == datetime(2025, 5, 20, 15, 0)
+    assert parse_when("someday", now) is None
+    assert parse_when("today at 13pm", now) is None
+    assert parse_when("9999-12-31T23:59:59-05:00", now) is None
+    assert parse_when("0001-01-01T00:00:00+05:00", now) is None
+
+def test_parse_duration():
+    """Test duration strings, including ones too long to add to a date"""
+    assert parse_duration("90") == timedelta(seconds=90)
+    assert parse_duration("24h") == timedelta(hours=24)
+    assert parse_duration("2w") == timedelta(weeks=2)
+    for value in ("soon", "-5m", "99999999d", "1" * 400):
+        with pytest.raises(ValueError):
+            parse_duration(value)
+
+@pytest.mark.asyncio
+async def test_upcoming_tasks_window():
+    """Test time-window queries over pending tasks"""
+    manager = TaskManager()
+    now = datetime.now()
+    for title, hours in [("Later", 30), ("Soon", 1), ("Sooner", 0.5)]:
+        due = (now + timedelta(hours=hours)).isoformat()
+        await manager.add_task("alice", {"title": title, "when": due, "description": ""})
+    await manager.add_task("alice", {"title": "Unscheduled", "when": "someday", "description": ""})
+
+    upcoming = await manager.upcoming_tasks("alice", timedelta(hours=24), now)
+    assert [t.title for t in upcoming] == ["Sooner", "Soon"]
+
+    await manager.complete_task("alice", "Sooner")
+    await manager.remove_task("alice", "Soon")
+    assert await manager.upcoming_tasks("alice", timedelta(hours=24), now) == ()
+    assert manager.next_due() == (await manager.list_tasks("alice"))[0].due_at
+
+@pytest.mark.asyncio
+async def test_reminder_fires_at_due_time():
+    """Test that the scheduler wakes for a task added while it sleeps"""
+    manager = TaskManager()
+    scheduler = ReminderScheduler(manager)
+    scheduler.start()
+    try:
+        later = (datetime.now() + timedelta(hours=1)).isoformat()
+        await manager.add_task("bob", {"title": "Later", "when": later, "description": ""})
+        soon = (datetime.now() + timedelta(milliseconds=50)).isoformat()
+        await manager.add_task("bob", {"title": "Soon", "when": soon, "description": ""})
+        await asyncio.sleep(0.3)
+        assert [t.title for t in scheduler.collect("bob")] == ["Soon"]
+        assert scheduler.collect("bob") == []
+    finally:
+        await scheduler.stop()
+
+@pytest.mark.asyncio
+async def test_page_tasks_with_cursor_and_filters():
+    """Test cursor pagination and filters over a user's tasks"""
+    manager = TaskManager()
+    now = datetime.now()
+    for i in range(5):
+        due = (now + timedelta(days=i)).isoformat()
+        await manager.add_task("alice", {"title": f"Task {i}", "when": due, "description": ""})
+    await manager.complete_task("alice", "Task 1")
+
+    page, cursor = await manager.page_tasks("alice", limit=2)
+    assert [t.title for t in page] == ["Task 0", "Task 1"]
+    page, cursor = await manager.page_tasks("alice", after_id=cursor, limit=2)
+    assert [t.title for t in page] == ["Task 2", "Task 3"]
+    page, cursor = await manager.page_tasks("alice", after_id=cursor, limit=2)
+    assert [t.title for t in page] == ["Task 4"]
+    assert cursor is None
+
+    page, _ = await manager.page_tasks("alice", completed=False, due_before=now + timedelta(days=2, hours=1))
+    assert [t.title for t in page] == ["Task 0", "Task 2"]
+
+    # Timezone-aware bounds are compared in local time
+    aware = (now + timedelta(days=3, hours=1)).astimezone(timezone.utc)
+    page, _ = await manager.page_tasks("alice", due_after=aware)
+    assert [t.title for t in page] == ["Task 4"]
+
+    # Bounds past the datetime limits once converted still filter
+    late = datetime.fromisoformat("9999-12-31T23:59:59-05:00")
+    early = datetime.fromisoformat("0001-01-01T00:00:00+05:00")
+    assert (await manager.page_tasks("alice", due_after=late))[0] == ()
+    assert len((await manager.page_tasks("alice", due_after=early, due_before=late))[0]) == 5
+
+@pytest.mark.asyncio
+async def test_version_changes_on_write():
+    """Test that the list version only changes when tasks change"""
+    manager = TaskManager()
+    empty = manager.version("alice")
+    await manager.add_task("alice", {"title": "Demo", "when": "today", "description": ""})
+    added = manager.version("alice")
+    assert added != empty
+    await manager.list_tasks("alice")
+    assert manager.version("alice") == added
+    await manager.complete_task("alice", "Demo")
+    assert manager.version("alice") != added
+    assert TaskManager().version("alice") != empty
+
+@pytest.mark.asyncio
+async def test_apply_bulk_partial_and_atomic():
+    """Test bulk operations with per-item results and all-or-nothing mode"""
+    manager = TaskManager()
+    operations = [
+        {"op": "create", "title": "Onboard", "when": "tomorrow at 9am", "description": "o"},
+        {"op": "complete", "title": "Onboard"},
+        {"op": "delete", "title": "Missing"},
+    ]
+
+    applied, results = await manager.apply_bulk("alice", operations, atomic=True)
+    assert not applied
+    assert [r["status"] for r in results] == ["skipped", "skipped", "not_found"]
+    assert await manager.list_tasks("alice") == ()
+
+    applied, results = await manager.apply_bulk("alice", operations)
+    assert applied
+    assert [r["status"] for r in results] == ["success", "success", "not_found"]
+    assert results[1]["task"].completed
+
+    applied, results = await manager.apply_bulk("alice", [
+        {"op": "delete", "title": "Onboard"},
+        {"op": "delete", "title": "Onboard"},
+    ], atomic=True)
+    assert not applied
+    assert [r["status"] for r in results] == ["skipped", "not_found"]
@@ -4,6 +4,7 @@ import io
 import wave
 import numpy as np
 from ..main import app
+from ..tools import voice
 
 client = TestClient(app)
 
@@ -57,3 +58,127 @@ def test_voice_endpoint(auth_headers, sample_wav_file):
         assert wav.getnchannels() == 1  # Mono
         assert wav.getsampwidth() == 2  # 16-bit
         assert wav.getframerate() > 0
+
+async def chunks_of(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+@pytest.mark.asyncio
+async def test_audio_upload_is_capped_while_streaming(sample_wav_file):
+    """Test that uploads are read in chunks and rejected once over the cap"""
+    data = sample_wav_file.getvalue()
+    assert await voice.read_audio(chunks_of(data, 4096), len(data)) == data
+    with pytest.raises(voice.AudioTooLarge):
+        await voice.read_audio(chunks_of(data, 4096), len(data) - 1)
+
+def test_audio_decodes_in_memory(sample_wav_file):
+    """Test that WAV bytes decode without a temporary file"""
+    audio = voice.decode_audio(sample_wav_file.getvalue())
+    assert audio.sample_rate == 44100
+    assert len(audio.frame_data) == 44100 * 2
+    with pytest.raises(voice.AudioDecodeError):
+        voice.decode_audio(b"not audio")
+
+def test_pcm_is_resampled_for_whisper(sample_wav_file):
+    """Test that clips are converted to 16 kHz float samples in [-1, 1]"""
+    pcm = voice.decode_pcm(sample_wav_file.getvalue())
+    assert pcm.dtype == np.float32
+    assert abs(len(pcm) - 16000) <= 1
+    assert np.abs(pcm).max() <= 1.0
+
+def test_sentences_are_split_as_text_streams():
+    """Test that sentences are emitted once complete and short fragments are merged"""
+    splitter = voice.SentenceSplitter()
+    assert splitter.feed("Hello there. Our AI audit takes") == []
+    assert splitter.feed(" two weeks. Dr. Smith") == ["Hello there. Our AI audit takes two weeks."]
+    assert splitter.feed(" will contact you!\nThanks") == ["Dr. Smith will contact you!"]
+    assert splitter.flush() == "Thanks"
+    assert splitter.flush() is None
+
+def tone_wav(frames):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+@pytest.mark.asyncio
+async def test_streamed_speech_keeps_sentence_order(monkeypatch):
+    """Test that sentences synthesized concurrently are still played in order"""
+    import asyncio
+
+    async def fake_synthesize(text):
+        # Earlier sentences take longer, so they finish out of order
+        await asyncio.sleep(0.05 if text.startswith("First") else 0)
+        return tone_wav(text[:5].encode().ljust(6, b"."))
+
+    monkeypatch.setattr(voice, "synthesize", fake_synthesize)
+    answer = ["First sentence here", ". Second sentence here.", " Third sentence, no stop"]
+    chunks = [chunk async for chunk in voice.speak(chunks_of_text(answer))]
+
+    with wave.open(io.BytesIO(b"".join(chunks)), 'rb') as wav:
+        assert wav.getframerate() == 16000
+        assert wav.readframes(9) == b"First.Secon.Third."
+
+async def chunks_of_text(parts):
+    for part in parts:
+        yield part
+
+def speech_and_silence(*segments, rate=16000):
+    """Concatenate (seconds, is_speech) segments over faint background noise"""
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds, is_speech in segments:
+        n = int(seconds * rate)
+        part = rng.normal(0, 0.001, n)
+        if is_speech:
+            part += 0.3 * np.sin(2 * np.pi * 220 * np.arange(n) / rate)
+        parts.append(part)
+    return np.concatenate(parts).astype(np.float32)
+
+def test_silence_is_trimmed_before_transcription():
+    """Test that leading, trailing and long internal silences are removed"""
+    pcm = speech_and_silence((1.0, False), (0.5, True), (2.0, False), (0.5, True), (1.5, False))
+    speech = voice.trim_silence(pcm, max_silence=0.3, padding=0.1)
+    # Two words, one shortened pause and a little padding remain
+    assert 1.2 <= len(speech) / 16000 <= 1.8
+    assert len(voice.trim_silence(speech_and_silence((3.0, False)))) == 0
+
+@pytest.mark.asyncio
+async def test_silent_upload_skips_transcription(monkeypatch):
+    """Test that a clip without speech is rejected before reaching the STT pool"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(np.zeros(16000, dtype=np.int16).tobytes())
+
+    async def fail(payload):
+        raise AssertionError("silence was sent to speech-to-text")
+
+    monkeypatch.setattr(voice.stt_pool, "submit", fail)
+    with pytest.raises(voice.NoSpeechDetected):
+        await voice.transcribe_audio(buffer.getvalue())
+
+@pytest.mark.asyncio
+async def test_open_speech_renders_missing_clips(monkeypatch, tmp_path):
+    """Test that a clip missing from disk is synthesized and returned as an open file"""
+    from ..tools.audio_cache import AudioCache
+
+    renders = []
+
+    async def fake_submit(text):
+        renders.append(text)
+        return tone_wav(b"hello.")
+
+    monkeypatch.setattr(voice, "tts_cache", AudioCache("tts", str(tmp_path), memory_bytes=1024, disk_bytes=1024))
+    monkeypatch.setattr(voice.tts_pool, "submit", fake_submit)
+
+    for _ in range(2):
+        speech = await voice.open_speech("Hello")
+        assert b"".join(voice.iter_file(speech)) == tone_wav(b"hello.")
+        assert speech.closed
+    assert renders == ["Hello"]
@@ -0,0 +1,53 @@
+"""Tests for the process worker pool"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from ..tools.worker_pool import PoolBusy, WorkerFailed, WorkerPool
+
+def init_state():
+    return {"pid": os.getpid(), "calls": 0}
+
+def handle(state, payload):
+    if payload == "hang":
+        time.sleep(60)
+    if payload == "boom":
+        raise ValueError("boom")
+    state["calls"] += 1
+    return state["pid"], state["calls"], payload
+
+@pytest.mark.asyncio
+async def test_workers_keep_state_and_recover():
+    """Test that state survives across jobs and hung or failing jobs are contained"""
+    pool = WorkerPool("test", init_state, handle, size=1, max_queue=0, job_timeout=1.0)
+    await pool.start()
+    try:
+        pid, calls, _ = await pool.submit("a")
+        assert await pool.submit("b") == (pid, calls + 1, "b")
+
+        with pytest.raises(ValueError, match="boom"):
+            await pool.submit("boom")
+
+        with pytest.raises(WorkerFailed, match="timeout"):
+            await pool.submit("hang")
+        assert pool.restarts == 1
+        new_pid, calls, _ = await pool.submit("c")
+        assert new_pid != pid and calls == 1
+    finally:
+        await pool.stop()
+
+@pytest.mark.asyncio
+async def test_full_pool_rejects_jobs():
+    """Test backpressure once every worker is busy and the queue is full"""
+    pool = WorkerPool("test", init_state, handle, size=1, max_queue=0, job_timeout=2.0)
+    await pool.start()
+    try:
+        busy = asyncio.create_task(pool.submit("hang"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(PoolBusy):
+            await pool.submit("x")
+        busy.cancel()
+    finally:
+        await pool.stop()
@@ -0,0 +1,270 @@
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class AudioCache:
+    """Two-tier LRU of rendered audio, addressed by a hash of its inputs
+
+    The key covers the text and every parameter that changes how it sounds,
+    so identical requests share one entry and changing the voice simply
+    misses. Recently used clips are kept in memory up to ``memory_bytes``.
+    Every clip is also written to ``directory``, up to ``disk_bytes``, where
+    it survives restarts, is shared by all workers on the host and can be
+    streamed from an open file. An empty ``directory`` disables the disk
+    tier. All file system access runs in the default executor; the index
+    is only touched on the event loop.
+
+    Each worker only sees its own writes as they happen, so after writing a
+    clip it re-reads the directory at most every ``rescan_interval``
+    seconds and evicts by file mtime. The disk budget therefore holds for
+    the whole host, overshooting at most by what the workers write between
+    rescans.
+    """
+
+    def __init__(self, name: str, directory: Optional[str], memory_bytes: int, disk_bytes: int,
+                 rescan_interval: float = 30.0):
+        self.name = name
+        self.directory = directory or None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.rescan_interval = rescan_interval
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        # key -> size of the files this worker knows about, oldest first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._scanned_at: Optional[float] = None
+        self._rendering: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def key(text: str, **params) -> str:
+        """Content address for ``text`` rendered with ``params``"""
+        payload = json.dumps({"text": text, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """Clips in the directory as (mtime, key, size), oldest first"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".wav"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another worker meanwhile
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        return sorted(entries)
+
+    def _load_index(self, entries: List[Tuple[float, str, int]]) -> None:
+        self._disk = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_size = sum(self._disk.values())
+        self._scanned_at = time.monotonic()
+
+    async def _rescan(self) -> None:
+        """Pick up clips left by earlier runs or other workers, oldest first"""
+        self._load_index(await asyncio.get_running_loop().run_in_executor(None, self._scan))
+        await self._evict_disk()
+
+    async def _index(self) -> None:
+        if self._scanned_at is None:
+            await self._rescan()
+
+    @staticmethod
+    def _unlink(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # Another worker evicted it first
+
+    async def _evict_disk(self) -> None:
+        victims = []
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            victims.append(self._file(key))
+        if victims:
+            await asyncio.get_running_loop().run_in_executor(None, self._unlink, victims)
+
+    def _found(self, key: str, size: Optional[int]) -> None:
+        """Record whether a clip is on disk after looking for it"""
+        if size is None:
+            if key in self._disk:
+                self._disk_size -= self._disk.pop(key)
+            return
+        if key not in self._disk:
+            self._disk_size += size
+        self._disk[key] = size
+        self._disk.move_to_end(key)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        # Refresh the mtime so restarts and other workers see it as recent
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Already open or read, so evicting it now does no harm
+
+    # Probes run in the executor and return (result, file size), or None if
+    # the clip is not on disk
+
+    @classmethod
+    def _stat(cls, path: str) -> Optional[Tuple[str, int]]:
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            return None
+        cls._touch(path)
+        return path, size
+
+    @classmethod
+    def _open(cls, path: str) -> Optional[Tuple[BinaryIO, int]]:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        cls._touch(path)
+        return f, os.fstat(f.fileno()).st_size
+
+    @classmethod
+    def _read(cls, path: str) -> Optional[Tuple[bytes, int]]:
+        opened = cls._open(path)
+        if opened is None:
+            return None
+        with opened[0] as f:
+            data = f.read()
+        return data, len(data)
+
+    async def _on_disk(self, key: str, probe: Callable[[str], Optional[Tuple]]):
+        """Run ``probe`` on the clip's file off the loop and track the outcome"""
+        if self.directory is None:
+            return None
+        await self._index()
+        found = await asyncio.get_running_loop().run_in_executor(None, probe, self._file(key))
+        if found is None:
+            self._found(key, None)
+            return None
+        result, size = found
+        self._found(key, size)
+        return result
+
+    async def path(self, key: str) -> Optional[str]:
+        """
+        Path of a cached clip on disk
+
+        Another worker may evict the file at any time; use ``open`` to serve it.
+
+        Returns:
+            The path, or None if the disk tier is disabled or lacks the clip
+        """
+        return await self._on_disk(key, self._stat)
+
+    async def open(self, key: str) -> Optional[BinaryIO]:
+        """
+        Cached clip on disk, opened for streaming
+
+        The open file stays readable even if another worker evicts the clip.
+
+        Returns:
+            The file, or None if the disk tier is disabled or lacks the clip
+        """
+        return await self._on_disk(key, self._open)
+
+    def _write(self, key: str, data: bytes) -> None:
+        # Write-then-rename so no reader ever sees a partial clip
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Cached clip from memory or disk, or None"""
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            metrics.inc(f"concierge_{self.name}_cache_memory_hits_total", help=f"{self.name} clips served from memory")
+            return data
+        data = await self._on_disk(key, self._read)
+        if data is not None:
+            self._remember(key, data)
+            metrics.inc(f"concierge_{self.name}_cache_disk_hits_total", help=f"{self.name} clips served from disk")
+        return data
+
+    async def put(self, key: str, data: bytes) -> None:
+        """Store a clip in both tiers"""
+        self._remember(key, data)
+        if self.directory is None:
+            return
+        await self._index()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, key, data)
+        except OSError:
+            logger.exception("Could not write %s clip to cache", self.name)
+            return
+        if time.monotonic() - self._scanned_at >= self.rescan_interval:
+            # Other workers' clips only show up in the directory
+            await self._rescan()
+            return
+        self._found(key, len(data))
+        await self._evict_disk()
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        Cached clip, rendering and storing it on a miss
+
+        Concurrent misses for the same key share a single render.
+        """
+        data = await self.get(key)
+        if data is not None:
+            return data
+        while (pending := self._rendering.get(key)) is not None:
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return pending.result()
+            # The request rendering it went away; render it here instead
+        metrics.inc(f"concierge_{self.name}_cache_misses_total", help=f"{self.name} clips rendered on a cache miss")
+        pending = asyncio.get_running_loop().create_future()
+        self._rendering[key] = pending
+        try:
+            data = await render()
+            await self.put(key, data)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark it retrieved; waiters, if any, get it re-raised
+            pending.exception()
+            raise
+        finally:
+            del self._rendering[key]
+        pending.set_result(data)
+        return data
@@ -0,0 +1,162 @@
+from typing import Dict, Optional, Union
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+
+from ..core.background import work_queue
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..models.rag import RAGSystem, RetrievalConfig
+from .retrieve_docs import HybridRetriever, vector_retriever
+
+logger = logging.getLogger(__name__)
+
+TENANT_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+Retriever = Union[RAGSystem, HybridRetriever]
+
+class UnknownTenant(LookupError):
+    """Raised when a tenant has no knowledge base"""
+
+def load_retrieval_config(path: str) -> RetrievalConfig:
+    """
+    Retrieval parameters written by benchmarks/tune_retrieval.py
+
+    Without a tuned file, the engine and fusion settings come from
+    RETRIEVAL_MODE, RETRIEVAL_CANDIDATES, RETRIEVAL_RRF_K and
+    RETRIEVAL_MAX_DISTANCE.
+    """
+    if path and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            config = RetrievalConfig(**json.load(f)["config"])
+        logger.info("Using tuned retrieval config from %s: %s", path, config)
+        return config
+    return RetrievalConfig(
+        engine=settings.RETRIEVAL_MODE,
+        candidates=settings.RETRIEVAL_CANDIDATES,
+        rrf_k=settings.RETRIEVAL_RRF_K,
+        max_distance=settings.RETRIEVAL_MAX_DISTANCE,
+    )
+
+def estimate_size(value) -> int:
+    """Approximate bytes held by a tree of dicts, lists and scalars"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
+class KnowledgeBaseRegistry:
+    """Per-tenant knowledge bases, loaded on first use and evicted LRU
+
+    Tenant ``t`` is served from ``directory/t.json``; requests without a
+    tenant use ``default_path``. All are built with ``config``; with the
+    hybrid engine each is paired with the tenant's vector collection, which
+    is brought in line with the documents in the background whenever they
+    are loaded. Loaded indexes are kept
+    until their estimated total size exceeds ``memory_budget``, at which
+    point the least recently used ones are dropped and reloaded when next
+    needed. Concurrent requests for a tenant that is not loaded share a
+    single load.
+    """
+
+    def __init__(self, directory: str, default_path: str, memory_budget: int,
+                 config: Optional[RetrievalConfig] = None):
+        self.directory = directory
+        self.default_path = default_path
+        self.memory_budget = memory_budget
+        self.config = config or RetrievalConfig()
+        self._loaded: "OrderedDict[Optional[str], Retriever]" = OrderedDict()
+        self._sizes: Dict[Optional[str], int] = {}
+        self._loading: Dict[Optional[str], asyncio.Task] = {}
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def path_for(self, tenant: Optional[str]) -> str:
+        """
+        Knowledge base file for a tenant
+
+        Raises:
+            UnknownTenant: If the id is malformed or has no knowledge base
+        """
+        if tenant is None:
+            return self.default_path
+        if not TENANT_ID.match(tenant):
+            raise UnknownTenant(f"Invalid tenant id {tenant!r}")
+        path = os.path.join(self.directory, f"{tenant}.json")
+        if not os.path.isfile(path):
+            raise UnknownTenant(f"No knowledge base for tenant {tenant!r}")
+        return path
+
+    async def get(self, tenant: Optional[str] = None) -> Retriever:
+        """
+        The tenant's knowledge base, loading it if needed
+
+        Raises:
+            UnknownTenant: If the tenant has no knowledge base
+        """
+        rag = self._loaded.get(tenant)
+        if rag is not None:
+            self._loaded.move_to_end(tenant)
+            return rag
+        task = self._loading.get(tenant)
+        if task is None:
+            task = asyncio.create_task(self._load(tenant))
+            self._loading[tenant] = task
+            task.add_done_callback(lambda _: self._loading.pop(tenant, None))
+        # Shielded so one caller giving up does not cancel the others' load
+        return await asyncio.shield(task)
+
+    def _read(self, path: str):
+        rag = RAGSystem(path, self.config)
+        return rag, estimate_size(rag.knowledge_base)
+
+    async def _load(self, tenant: Optional[str]) -> Retriever:
+        path = self.path_for(tenant)
+        with metrics.timer("kb_load"):
+            rag, size = await asyncio.get_running_loop().run_in_executor(None, self._read, path)
+        if self.config.engine == "hybrid":
+            rag = HybridRetriever(
+                rag,
+                vector_retriever(tenant),
+                deadline=settings.RETRIEVAL_DEADLINE,
+                candidates=self.config.candidates,
+                rrf_k=self.config.rrf_k,
+                max_distance=self.config.max_distance,
+            )
+            # Until the sync finishes, fusion works with what the collection has
+            work_queue.submit("vector_sync", rag.vector.sync, rag.knowledge_base)
+        metrics.inc("concierge_kb_loads_total", help="Knowledge bases loaded")
+        self._loaded[tenant] = rag
+        self._sizes[tenant] = size
+        if size > self.memory_budget:
+            logger.warning("Knowledge base %s (%d bytes) alone exceeds the memory budget", path, size)
+        self._evict(keep=tenant)
+        return rag
+
+    def _evict(self, keep: Optional[str]) -> None:
+        while self.loaded_bytes > self.memory_budget and len(self._loaded) > 1:
+            tenant = next(iter(self._loaded))
+            if tenant == keep:
+                self._loaded.move_to_end(tenant)
+                continue
+            del self._loaded[tenant]
+            del self._sizes[tenant]
+            metrics.inc("concierge_kb_evictions_total", help="Knowledge bases evicted to stay within the memory budget")
+            logger.info("Evicted knowledge base for tenant %s", tenant or "(default)")
+        metrics.set_gauge("concierge_kb_loaded_bytes", self.loaded_bytes, "Estimated size of loaded knowledge bases")
+
+# Global registry of tenant knowledge bases
+knowledge_bases = KnowledgeBaseRegistry(
+    settings.KNOWLEDGE_BASE_DIR,
+    settings.KNOWLEDGE_BASE_PATH,
+    memory_budget=settings.KNOWLEDGE_BASE_MEMORY_BYTES,
+    config=load_retrieval_config(settings.RETRIEVAL_CONFIG_PATH),
+)
@@ -1,90 +1,467 @@
-from typing import Dict, List, Optional
-from pydantic import BaseModel
-from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel, ConfigDict
+from datetime import MAXYEAR, datetime, timedelta
 import asyncio
-from collections import defaultdict
+import bisect
+import heapq
+import itertools
+import uuid
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+from ..core.metrics import metrics
+
+from .schedule import local_time, parse_when
+from .task_store import TaskStore
+
+def _local_bound(moment: datetime) -> datetime:
+    """``moment`` in local time, clamped when it lies beyond the datetime range"""
+    try:
+        return local_time(moment)
+    except OverflowError:
+        # Only aware times within a day of the limits overflow, and no due
+        # time lies beyond them
+        return datetime.max if moment.year == MAXYEAR else datetime.min
 
 class Task(BaseModel):
-    """Task model for the in-memory task manager"""
+    """Task model for the in-memory task manager
+
+    Tasks are immutable so that snapshots handed out by ``list_tasks`` can be
+    shared between callers without copying.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    id: int = 0
     title: str
     when: str
     description: str
+    due_at: Optional[datetime] = None
     created_at: datetime = datetime.now()
     completed: bool = False
 
-class TaskManager:
-    """In-memory task management system"""
-    
+    @property
+    def pending(self) -> bool:
+        """Whether the task still has a due time to wait for"""
+        return self.due_at is not None and not self.completed
+
+class _UserTasks:
+    """Tasks owned by a single user
+
+    ``tasks`` keeps insertion order (ids are monotonically increasing) and
+    ``by_title`` maps a title to the ids carrying it, oldest first, so that
+    lookups by title are O(1) even when titles repeat. ``schedule`` holds
+    ``(due_at, id)`` pairs of pending tasks in time order for range queries.
+    """
+
+    __slots__ = ("tasks", "by_title", "schedule", "snapshot", "version")
+
     def __init__(self):
+        self.tasks: Dict[int, Task] = {}
+        self.by_title: Dict[str, Deque[int]] = {}
+        self.schedule: List[Tuple[datetime, int]] = []
+        self.snapshot: Optional[Tuple[Task, ...]] = None
+        # Bumped on every change, used for conditional GETs
+        self.version = 0
+
+    def add(self, task: Task) -> None:
+        self.tasks[task.id] = task
+        self.by_title.setdefault(task.title, deque()).append(task.id)
+        if task.pending:
+            bisect.insort(self.schedule, (task.due_at, task.id))
+        self._changed()
+
+    def find(self, title: str) -> Optional[Task]:
+        ids = self.by_title.get(title)
+        return self.tasks[ids[0]] if ids else None
+
+    def replace(self, task: Task) -> None:
+        old = self.tasks[task.id]
+        if old.pending and not task.pending:
+            self._unschedule(old)
+        self.tasks[task.id] = task
+        self._changed()
+
+    def discard(self, task: Task) -> None:
+        del self.tasks[task.id]
+        ids = self.by_title[task.title]
+        ids.remove(task.id)
+        if not ids:
+            del self.by_title[task.title]
+        if task.pending:
+            self._unschedule(task)
+        self._changed()
+
+    def _changed(self) -> None:
+        self.snapshot = None
+        self.version += 1
+
+    def _unschedule(self, task: Task) -> None:
+        i = bisect.bisect_left(self.schedule, (task.due_at, task.id))
+        del self.schedule[i]
+
+    def between(self, start: datetime, end: datetime) -> Tuple[Task, ...]:
+        lo = bisect.bisect_left(self.schedule, (start, 0))
+        hi = bisect.bisect_right(self.schedule, (end, float("inf")))
+        return tuple(self.tasks[task_id] for _, task_id in self.schedule[lo:hi])
+
+    def freeze(self) -> Tuple[Task, ...]:
+        if self.snapshot is None:
+            self.snapshot = tuple(self.tasks.values())
+        return self.snapshot
+
+class TaskManager:
+    """In-memory task management system
+
+    Users are spread over a fixed set of lock stripes so that operations for
+    different users rarely contend, while the number of locks stays bounded.
+    """
+
+    def __init__(self, lock_stripes: int = 64):
         # Using defaultdict to store tasks per user
-        self._tasks: Dict[str, List[Task]] = defaultdict(list)
-        self._lock = asyncio.Lock()
-    
+        self._tasks: Dict[str, _UserTasks] = defaultdict(_UserTasks)
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
+        self._ids = itertools.count(1)
+        self._epoch = uuid.uuid4().hex[:8]
+        self._store: Optional[TaskStore] = None
+        # Global (due_at, id, user_id) heap of pending tasks. Completed and
+        # removed tasks are dropped lazily when they reach the top.
+        self._due: List[Tuple[datetime, int, str]] = []
+        self._due_ids: Set[int] = set()
+        self._due_listener: Optional[Callable[[datetime], None]] = None
+
+    def open_store(self, store: TaskStore) -> bool:
+        """
+        Restore tasks from a durable store and journal every later change to it
+
+        Must be called from the running event loop before serving requests.
+
+        Args:
+            store: Store to restore from and write to
+
+        Returns:
+            True if persistence is active, False if another process owns the store
+        """
+        if not store.open():
+            return False
+        state = store.load()
+        self._tasks.clear()
+        self._due.clear()
+        self._due_ids.clear()
+        max_id = 0
+        for user_id, tasks in state.items():
+            for task in tasks:
+                self._insert(user_id, Task(**task))
+                max_id = max(max_id, task["id"])
+        self._ids = itertools.count(max_id + 1)
+        store.start(self._export)
+        self._store = store
+        return True
+
+    async def close_store(self) -> None:
+        """Flush outstanding journal records and detach the store"""
+        if self._store is not None:
+            store, self._store = self._store, None
+            await store.close()
+
+    def _export(self) -> Dict[str, Tuple[Task, ...]]:
+        return {user_id: user_tasks.freeze() for user_id, user_tasks in self._tasks.items()}
+
+    def _record(self, op: str, user_id: str, **fields) -> None:
+        if self._store is not None:
+            self._store.append({"op": op, "user": user_id, **fields})
+
+    def _lock_for(self, user_id: str) -> asyncio.Lock:
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    @asynccontextmanager
+    async def _locked(self, user_id: str):
+        """Hold the user's lock stripe, recording how long it took to get"""
+        lock = self._lock_for(user_id)
+        start = perf_counter()
+        await lock.acquire()
+        metrics.observe("task_lock_wait", perf_counter() - start)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def _insert(self, user_id: str, task: Task) -> None:
+        self._tasks[user_id].add(task)
+        if task.pending:
+            heapq.heappush(self._due, (task.due_at, task.id, user_id))
+            self._due_ids.add(task.id)
+            if self._due_listener is not None:
+                self._due_listener(task.due_at)
+
+    def _unscheduled(self, task: Task) -> None:
+        """Mark a completed or removed task's heap entry as stale"""
+        self._due_ids.discard(task.id)
+        # Rebuild once stale entries dominate so the heap stays proportional
+        # to the number of pending tasks.
+        if len(self._due) > 64 and len(self._due) > 2 * len(self._due_ids):
+            self._due = [entry for entry in self._due if entry[1] in self._due_ids]
+            heapq.heapify(self._due)
+
+    def set_due_listener(self, listener: Optional[Callable[[datetime], None]]) -> None:
+        """Register a callback invoked with the due time of each newly scheduled task"""
+        self._due_listener = listener
+
+    def next_due(self) -> Optional[datetime]:
+        """Return the earliest due time of any pending task"""
+        while self._due and self._due[0][1] not in self._due_ids:
+            heapq.heappop(self._due)
+        return self._due[0][0] if self._due else None
+
+    def pop_due(self, now: datetime) -> List[Tuple[str, Task]]:
+        """
+        Remove and return all pending tasks due at or before ``now``
+
+        Each task is returned once; it stays in the user's list and upcoming
+        index until completed or removed.
+
+        Args:
+            now: Cut-off time
+
+        Returns:
+            List of (user_id, Task) pairs in due order
+        """
+        due = []
+        while self._due and self._due[0][0] <= now:
+            _, task_id, user_id = heapq.heappop(self._due)
+            if task_id in self._due_ids:
+                self._due_ids.remove(task_id)
+                due.append((user_id, self._tasks[user_id].tasks[task_id]))
+        return due
+
+    async def upcoming_tasks(
+        self, user_id: str, within: timedelta, now: Optional[datetime] = None
+    ) -> Tuple[Task, ...]:
+        """
+        List a user's pending tasks due within a time window
+
+        Args:
+            user_id: Unique identifier for the user
+            within: Length of the window starting at ``now``
+            now: Start of the window, defaults to the current time
+
+        Returns:
+            Tasks ordered by due time
+        """
+        user_tasks = self._tasks.get(user_id)
+        if user_tasks is None:
+            return ()
+        now = now or datetime.now()
+        return user_tasks.between(now, now + within)
+
     async def add_task(self, user_id: str, task: Dict) -> Task:
         """
         Add a new task for a user
-        
+
         Args:
             user_id: Unique identifier for the user
             task: Task details including title, when, and description
-            
+
         Returns:
             Created Task object
         """
-        async with self._lock:
-            new_task = Task(**task)
-            self._tasks[user_id].append(new_task)
-            return new_task
-    
-    async def list_tasks(self, user_id: str) -> List[Task]:
+        async with self._locked(user_id):
+            return self._add_locked(user_id, task)
+
+    async def list_tasks(self, user_id: str) -> Tuple[Task, ...]:
         """
         List all tasks for a user
-        
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Immutable snapshot of the user's Task objects in insertion order
+        """
+        user_tasks = self._tasks.get(user_id)
+        if user_tasks is None:
+            return ()
+        # Snapshots are rebuilt lazily after a write and shared until the next
+        # one, so readers never need the lock.
+        return user_tasks.freeze()
+
+    def version(self, user_id: str) -> str:
+        """
+        Return an opaque token that changes whenever a user's tasks change
+
+        The token includes a per-process epoch so that versions handed out
+        before a restart never match afterwards.
+
         Args:
             user_id: Unique identifier for the user
-            
+
         Returns:
-            List of Task objects
+            Version token
         """
-        async with self._lock:
-            return self._tasks.get(user_id, [])
-    
+        user_tasks = self._tasks.get(user_id)
+        return f"{self._epoch}.{user_tasks.version if user_tasks else 0}"
+
+    async def page_tasks(
+        self,
+        user_id: str,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        completed: Optional[bool] = None,
+        due_after: Optional[datetime] = None,
+        due_before: Optional[datetime] = None,
+    ) -> Tuple[Tuple[Task, ...], Optional[int]]:
+        """
+        List a page of a user's tasks in insertion order
+
+        Args:
+            user_id: Unique identifier for the user
+            after_id: Only return tasks created after the task with this id
+            limit: Maximum number of tasks to return, None for all
+            completed: Only return tasks with this completion state
+            due_after: Only return tasks due at or after this time
+            due_before: Only return tasks due at or before this time; both
+                may be timezone-aware and are compared in local time
+
+        Returns:
+            The page of tasks and the id to resume after, or None on the last page
+        """
+        due_after = _local_bound(due_after) if due_after is not None else None
+        due_before = _local_bound(due_before) if due_before is not None else None
+        tasks = await self.list_tasks(user_id)
+        start = 0
+        if after_id is not None:
+            start = bisect.bisect_right(tasks, after_id, key=lambda task: task.id)
+        date_filter = due_after is not None or due_before is not None
+
+        page = []
+        for task in itertools.islice(tasks, start, None):
+            if completed is not None and task.completed != completed:
+                continue
+            if date_filter:
+                if task.due_at is None:
+                    continue
+                if due_after is not None and task.due_at < due_after:
+                    continue
+                if due_before is not None and task.due_at > due_before:
+                    continue
+            if limit is not None and len(page) == limit:
+                return tuple(page), page[-1].id
+            page.append(task)
+        return tuple(page), None
+
     async def complete_task(self, user_id: str, task_title: str) -> Optional[Task]:
         """
         Mark a task as completed
-        
+
         Args:
             user_id: Unique identifier for the user
             task_title: Title of the task to complete
-            
+
         Returns:
             Updated Task object or None if not found
         """
-        async with self._lock:
-            for task in self._tasks[user_id]:
-                if task.title == task_title:
-                    task.completed = True
-                    return task
-            return None
-    
+        async with self._locked(user_id):
+            return self._complete_locked(user_id, task_title)
+
     async def remove_task(self, user_id: str, task_title: str) -> bool:
         """
         Remove a task
-        
+
         Args:
             user_id: Unique identifier for the user
             task_title: Title of the task to remove
-            
+
         Returns:
             True if task was removed, False otherwise
         """
-        async with self._lock:
-            tasks = self._tasks[user_id]
-            for i, task in enumerate(tasks):
-                if task.title == task_title:
-                    tasks.pop(i)
-                    return True
-            return False
+        async with self._locked(user_id):
+            return self._remove_locked(user_id, task_title) is not None
+
+    async def apply_bulk(self, user_id: str, operations: List[Dict], atomic: bool = False) -> Tuple[bool, List[Dict]]:
+        """
+        Apply a batch of create, complete and delete operations in one critical section
+
+        Args:
+            user_id: Unique identifier for the user
+            operations: Dicts with an ``op`` of "create", "complete" or "delete",
+                a ``title`` and, for create, ``when`` and ``description``
+            atomic: If True, apply nothing unless every operation can succeed
+
+        Returns:
+            Whether the batch was applied, and a result dict per operation with
+            ``status`` "success", "not_found" or "skipped" and the affected task
+        """
+        async with self._locked(user_id):
+            if atomic:
+                failures = self._check_bulk(user_id, operations)
+                if failures:
+                    return False, [
+                        {"op": op["op"], "title": op["title"], "status": "not_found" if i in failures else "skipped", "task": None}
+                        for i, op in enumerate(operations)
+                    ]
+
+            results = []
+            for op in operations:
+                if op["op"] == "create":
+                    task = self._add_locked(user_id, {k: op[k] for k in ("title", "when", "description")})
+                elif op["op"] == "complete":
+                    task = self._complete_locked(user_id, op["title"])
+                else:
+                    task = self._remove_locked(user_id, op["title"])
+                results.append({
+                    "op": op["op"],
+                    "title": op["title"],
+                    "status": "success" if task else "not_found",
+                    "task": task,
+                })
+            return True, results
+
+    def _check_bulk(self, user_id: str, operations: List[Dict]) -> Set[int]:
+        """Return the indexes of operations that would fail, simulating title counts"""
+        user_tasks = self._tasks.get(user_id)
+        counts: Dict[str, int] = {}
+        failures = set()
+        for i, op in enumerate(operations):
+            title = op["title"]
+            if title not in counts:
+                counts[title] = len(user_tasks.by_title.get(title, ())) if user_tasks else 0
+            if op["op"] == "create":
+                counts[title] += 1
+            elif counts[title] == 0:
+                failures.add(i)
+            elif op["op"] == "delete":
+                counts[title] -= 1
+        return failures
+
+    def _add_locked(self, user_id: str, task: Dict) -> Task:
+        fields = {**task, "id": next(self._ids)}
+        if fields.get("due_at") is None:
+            fields["due_at"] = parse_when(fields["when"])
+        new_task = Task(**fields)
+        self._insert(user_id, new_task)
+        self._record("add", user_id, task=new_task.model_dump(mode="json"))
+        return new_task
+
+    def _complete_locked(self, user_id: str, task_title: str) -> Optional[Task]:
+        user_tasks = self._tasks.get(user_id)
+        task = user_tasks.find(task_title) if user_tasks else None
+        if task is None:
+            return None
+        task = task.model_copy(update={"completed": True})
+        user_tasks.replace(task)
+        self._unscheduled(task)
+        self._record("complete", user_id, id=task.id)
+        return task
+
+    def _remove_locked(self, user_id: str, task_title: str) -> Optional[Task]:
+        user_tasks = self._tasks.get(user_id)
+        task = user_tasks.find(task_title) if user_tasks else None
+        if task is None:
+            return None
+        user_tasks.discard(task)
+        self._unscheduled(task)
+        self._record("remove", user_id, id=task.id)
+        return task
 
 # Global task manager instance
 task_manager = TaskManager()
@@ -0,0 +1,77 @@
+from typing import Deque, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+from collections import defaultdict, deque
+
+from .manage_tasks import Task, TaskManager, task_manager
+
+logger = logging.getLogger(__name__)
+
+class ReminderScheduler:
+    """Fires reminders when tasks become due
+
+    Instead of polling, the scheduler sleeps until the earliest due time in
+    the task manager's heap. Scheduling a task that is due sooner than the
+    current wake-up time interrupts the sleep so the deadline is recomputed.
+    Fired reminders are queued per user until collected.
+    """
+
+    def __init__(self, manager: TaskManager, max_pending_per_user: int = 100):
+        self.manager = manager
+        self._reminders: Dict[str, Deque[Task]] = defaultdict(lambda: deque(maxlen=max_pending_per_user))
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_wakeup: Optional[datetime] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start waiting for due tasks on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self.manager.set_due_listener(self._on_scheduled)
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler"""
+        self.manager.set_due_listener(None)
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def _on_scheduled(self, due_at: datetime) -> None:
+        if self._next_wakeup is None or due_at < self._next_wakeup:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            self._next_wakeup = self.manager.next_due()
+            timeout = None
+            if self._next_wakeup is not None:
+                timeout = max(0.0, (self._next_wakeup - datetime.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            for user_id, task in self.manager.pop_due(datetime.now()):
+                logger.info("Reminder for %s: %s is due", user_id, task.title)
+                self._reminders[user_id].append(task)
+
+    def collect(self, user_id: str) -> List[Task]:
+        """
+        Return and clear the reminders fired for a user
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            Due tasks in the order their reminders fired
+        """
+        reminders = self._reminders.pop(user_id, None)
+        return list(reminders) if reminders else []
+
+# Global reminder scheduler instance
+reminder_scheduler = ReminderScheduler(task_manager)
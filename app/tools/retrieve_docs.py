@@ -1,12 +1,18 @@
 from typing import Dict, List, Optional
-import chromadb
-from chromadb.config import Settings
-from openai import AsyncOpenAI
 from pydantic import BaseModel
-import os
+import asyncio
+import hashlib
+import logging
+import threading
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+from ..core.config import settings
+from ..core.llm import get_client
+from ..core.metrics import metrics
+from ..models import rag
+
+logger = logging.getLogger(__name__)
+
+SYNC_BATCH = 256  # documents embedded per Chroma call
 
 class Document(BaseModel):
     """Document model for retrieved content"""
@@ -20,29 +26,50 @@ class RetrievalResult(BaseModel):
     docs: List[Document]
 
 class DocumentRetriever:
-    """RAG-powered document retrieval using ChromaDB"""
+    """RAG-powered document retrieval using ChromaDB
+
+    The Chroma client is opened on first use; importing chromadb alone takes
+    most of a second.
+    """
     
-    def __init__(self):
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection = self.client.get_or_create_collection("knowledge_base")
+    def __init__(self, path: str = "./chroma_db", collection_name: str = "knowledge_base"):
+        self.path = path
+        self.collection_name = collection_name
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        """The knowledge base collection, opened on first access"""
+        with self._lock:
+            if self._collection is None:
+                import chromadb
+                client = chromadb.PersistentClient(path=self.path)
+                self._collection = client.get_or_create_collection(self.collection_name)
+        return self._collection
     
-    async def retrieve_docs(self, query: str) -> RetrievalResult:
+    async def retrieve_docs(self, query: str, k: int = 3, max_distance: Optional[float] = None) -> RetrievalResult:
         """
         Retrieve relevant documents based on the query
         
         Args:
             query: User's question
+            k: Number of documents to return
+            max_distance: Leave out documents further than this from the query
             
         Returns:
             RetrievalResult containing query and relevant documents
         """
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=3
+        # Embedding and search block; keep them off the event loop
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.collection.query(query_texts=[query], n_results=k)
         )
         
+        distances = (results.get('distances') or [[]])[0]
         docs = []
         for idx, doc in enumerate(results['documents'][0]):
+            if max_distance is not None and idx < len(distances) and distances[idx] > max_distance:
+                continue
             docs.append(Document(
                 content=doc,
                 source=results['metadatas'][0][idx].get('source', 'Unknown'),
@@ -50,6 +77,36 @@ class DocumentRetriever:
             ))
         
         return RetrievalResult(query=query, docs=docs)
+
+    def _sync(self, documents: List[Dict]) -> int:
+        wanted = {document_id(doc): doc for doc in documents}
+        existing = set(self.collection.get(include=[])["ids"])
+        stale = list(existing - wanted.keys())
+        new = [doc_id for doc_id in wanted if doc_id not in existing]
+        if stale:
+            self.collection.delete(ids=stale)
+        for start in range(0, len(new), SYNC_BATCH):
+            batch = new[start:start + SYNC_BATCH]
+            self.collection.add(
+                ids=batch,
+                documents=[wanted[doc_id]["content"] for doc_id in batch],
+                metadatas=[vector_metadata(wanted[doc_id]) for doc_id in batch],
+            )
+        return len(stale) + len(new)
+
+    async def sync(self, documents: List[Dict]) -> int:
+        """
+        Make the collection hold exactly ``documents``
+
+        Documents are keyed by a hash of their source and content, so only
+        new ones are embedded and reloading an unchanged knowledge base costs
+        one listing of the collection's ids.
+
+        Returns:
+            Number of documents added or removed
+        """
+        with metrics.timer("vector_sync"):
+            return await asyncio.get_running_loop().run_in_executor(None, self._sync, documents)
     
     async def grade_retrieval(self, question: str, docs: List[Document]) -> Dict[str, float]:
         """
@@ -70,7 +127,7 @@ Retrieved Documents: {[doc.content for doc in docs]}
 Factual Relevance: [0-1]
 Answer Coverage: [0-1]"""
 
-        response = await client.chat.completions.create(
+        response = await get_client().chat.completions.create(
             model="gpt-4",
             messages=[{"role": "system", "content": prompt}]
         )
@@ -85,5 +142,125 @@ Answer Coverage: [0-1]"""
             "answer_coverage": coverage
         }
 
+def document_id(doc: Dict) -> str:
+    """Stable vector store id of a knowledge base document"""
+    return hashlib.sha1(f"{doc['source']}\0{doc['content']}".encode()).hexdigest()
+
+def vector_metadata(doc: Dict) -> Dict:
+    """A document's metadata as Chroma accepts it: scalar values plus the source"""
+    metadata = {key: value for key, value in (doc.get("metadata") or {}).items()
+                if isinstance(value, (str, int, float, bool))}
+    metadata["source"] = doc["source"]
+    return metadata
+
+def reciprocal_rank_fusion(rankings: List[List], k: int, rrf_k: int = 60) -> List:
+    """
+    Merge ranked document lists into one
+
+    A document scores ``1 / (rrf_k + rank)`` for each list it appears in;
+    documents are identified by source and content.
+
+    Returns:
+        The ``k`` best documents, each as first seen in ``rankings``
+    """
+    scores: Dict[tuple, float] = {}
+    docs: Dict[tuple, object] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = (doc.source, doc.content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+class HybridRetriever:
+    """Lexical and vector retrieval run side by side and fused
+
+    Both engines are queried concurrently for ``candidates`` documents each,
+    with lexical scoring in a worker thread so it holds up neither the
+    vector search nor the event loop. Each engine drops candidates below its
+    relevance cutoff, the lexical ``min_score`` or ``max_distance`` from the
+    query in the vector space, so an out-of-scope question can still come
+    back empty. The remaining rankings are merged with
+    reciprocal rank fusion: a document scores ``1 / (rrf_k + rank)`` per
+    list it appears in. Engines that have not answered within ``deadline``
+    seconds, or that fail, are left out, so a slow or unavailable engine
+    degrades to the other's results. Only if neither answers in time is the
+    first late answer used.
+    """
+
+    def __init__(self, lexical: "rag.RAGSystem", vector: DocumentRetriever, deadline: float = 0.5,
+                 candidates: int = 10, rrf_k: int = 60, max_distance: Optional[float] = None):
+        self.lexical = lexical
+        self.vector = vector
+        self.deadline = deadline
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.max_distance = max_distance
+
+    @property
+    def knowledge_base(self) -> List[Dict]:
+        return self.lexical.knowledge_base
+
+    def _rank_lexical(self, query: str) -> List["rag.Document"]:
+        min_score = self.lexical.config.min_score
+        return [
+            rag.Document(content=doc["content"], source=doc["source"], metadata=doc.get("metadata", {}))
+            for doc, score in self.lexical.score_docs(query)[:self.candidates]
+            if score > min_score
+        ]
+
+    async def _search(self, name: str, query: str) -> List:
+        with metrics.timer(f"retrieval_{name}"):
+            if name == "lexical":
+                # Past the deadline the thread runs on, but nobody waits for it
+                return await asyncio.get_running_loop().run_in_executor(None, self._rank_lexical, query)
+            return (await self.vector.retrieve_docs(query, k=self.candidates, max_distance=self.max_distance)).docs
+
+    async def retrieve_docs(self, query: str, k: Optional[int] = None) -> "rag.RetrievalResult":
+        """
+        Retrieve the top ``k`` documents by fused rank, by default as many
+        as the lexical engine is configured to return
+
+        Returns:
+            RetrievalResult in the lexical engine's document model
+        """
+        searches = {asyncio.create_task(self._search(name, query)): name for name in ("lexical", "vector")}
+        done, pending = await asyncio.wait(searches, timeout=self.deadline)
+        rankings = self._collect(done, searches)
+        while not rankings and pending:
+            # Nothing usable in time; better late than an empty answer
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            rankings = self._collect(done, searches)
+        for task in pending:
+            metrics.inc(f"concierge_retrieval_{searches[task]}_timeouts_total",
+                        help=f"Hybrid retrievals that went ahead without the {searches[task]} engine")
+            task.cancel()
+
+        fused = reciprocal_rank_fusion(rankings, k or self.lexical.config.k, self.rrf_k)
+        return rag.RetrievalResult(
+            query=query,
+            docs=[rag.Document(content=doc.content, source=doc.source, metadata=doc.metadata) for doc in fused],
+        )
+
+    @staticmethod
+    def _collect(done, searches) -> List[List]:
+        rankings = []
+        for task in done:
+            if task.exception() is not None:
+                metrics.inc(f"concierge_retrieval_{searches[task]}_failures_total",
+                            help=f"Hybrid retrievals where the {searches[task]} engine failed")
+                logger.warning("%s retrieval failed: %s", searches[task], task.exception())
+            else:
+                rankings.append(task.result())
+        return rankings
+
+    async def grade_retrieval(self, question: str, result: "rag.RetrievalResult") -> "rag.GradingResult":
+        """Grade with the lexical engine's local grader"""
+        return await self.lexical.grade_retrieval(question, result)
+
+def vector_retriever(tenant: Optional[str] = None) -> DocumentRetriever:
+    """Vector index for a tenant's knowledge base"""
+    return DocumentRetriever(settings.CHROMA_PATH, f"knowledge_base_{tenant}" if tenant else "knowledge_base")
+
 # Create global RAG system instance
 rag_system = DocumentRetriever()
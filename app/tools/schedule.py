@@ -0,0 +1,114 @@
+from typing import Optional
+from datetime import datetime, timedelta
+import re
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Default time of day when only a day is given
+DEFAULT_HOUR = 9
+
+_DAY_PATTERN = re.compile(
+    r'^(?P<day>today|tomorrow|' + '|'.join(WEEKDAYS) + r')'
+    r'(?:\s+(?:at\s+)?(?P<time>.+))?$'
+)
+_TIME_PATTERN = re.compile(r'^(?:at\s+)?(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>am|pm)?$')
+_DURATION_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$')
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+# Longest accepted duration; far beyond it ``now + duration`` overflows
+MAX_DURATION = timedelta(days=3660)
+
+def local_time(moment: datetime) -> datetime:
+    """``moment`` as naive local time, the form task due times are kept in"""
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+
+def _parse_time(text: str) -> Optional[tuple]:
+    match = _TIME_PATTERN.match(text)
+    if not match:
+        return None
+    hour, minute, ampm = match.groups()
+    h = int(hour)
+    m = int(minute) if minute else 0
+    if ampm:
+        if not 1 <= h <= 12:
+            return None
+        h = h % 12 + (12 if ampm == "pm" else 0)
+    if h > 23 or m > 59:
+        return None
+    return h, m
+
+def parse_when(when: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Resolve a task's free-form ``when`` string to a timestamp
+
+    Understands ISO 8601 datetimes and the phrases produced by the chat
+    scheduler, e.g. "tomorrow at 3pm", "friday 10:30 am", "at 9am" or
+    "monday". Relative phrases resolve to the next matching moment after
+    ``now``.
+
+    Args:
+        when: Free-form schedule string
+        now: Reference time, defaults to the current local time
+
+    Returns:
+        Naive local datetime, or None if the string is not understood
+    """
+    now = now or datetime.now()
+    text = when.strip()
+    try:
+        # Compare against naive local time like the rest of the task model
+        return local_time(datetime.fromisoformat(text))
+    except OverflowError:
+        # An aware time so near the datetime limits it has no local equivalent
+        return None
+    except ValueError:
+        pass
+
+    text = " ".join(text.lower().split())
+    match = _DAY_PATTERN.match(text)
+    if not match:
+        time_of_day = _parse_time(text)
+        if time_of_day is None:
+            return None
+        due = now.replace(hour=time_of_day[0], minute=time_of_day[1], second=0, microsecond=0)
+        if due <= now:
+            due += timedelta(days=1)
+        return due
+
+    day, time_text = match.groups()
+    time_of_day = _parse_time(time_text) if time_text else (DEFAULT_HOUR, 0)
+    if time_of_day is None:
+        return None
+    if day == "today":
+        offset = 0
+    elif day == "tomorrow":
+        offset = 1
+    else:
+        offset = (WEEKDAYS.index(day) - now.weekday()) % 7
+    due = (now + timedelta(days=offset)).replace(
+        hour=time_of_day[0], minute=time_of_day[1], second=0, microsecond=0
+    )
+    if day in WEEKDAYS and due <= now:
+        due += timedelta(days=7)
+    return due
+
+def parse_duration(value: str) -> timedelta:
+    """
+    Parse a duration such as "90", "30m", "24h" or "7d"
+
+    Args:
+        value: Number of seconds, optionally suffixed with s, m, h, d or w
+
+    Returns:
+        Parsed duration
+
+    Raises:
+        ValueError: If the value is not a valid duration or exceeds MAX_DURATION
+    """
+    match = _DURATION_PATTERN.match(value.lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    amount, unit = match.groups()
+    seconds = float(amount) * _DURATION_UNITS[unit]
+    if seconds > MAX_DURATION.total_seconds():
+        raise ValueError(f"Duration {value!r} exceeds {MAX_DURATION.days} days")
+    return timedelta(seconds=seconds)
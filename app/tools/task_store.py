@@ -0,0 +1,234 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Snapshot state: user id -> list of task dicts in insertion order
+TaskState = Dict[str, List[Dict]]
+
+class TaskStore:
+    """Durable backing store for the TaskManager
+
+    Every mutation is appended to a line-oriented journal. Records only hit
+    memory on the request path; a background flusher writes and fsyncs them
+    in batches every ``fsync_interval`` seconds (``0`` fsyncs each record
+    inline). Once ``snapshot_every`` records have accumulated, the full state
+    is written to a compact snapshot and the journal is truncated, so startup
+    only has to read the snapshot plus a short journal tail.
+
+    Every record carries a sequence number and the snapshot stores the last
+    one it covers, which makes replay idempotent if the process dies between
+    writing the snapshot and truncating the journal.
+
+    The store expects a single writer per directory. When another process
+    (e.g. a sibling uvicorn worker) already holds the directory lock,
+    ``open`` returns False; the app then refuses to start, since tasks are
+    only held in one process's memory.
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 1.0, snapshot_every: int = 1000):
+        self.directory = Path(directory)
+        self.journal_path = self.directory / "tasks.journal"
+        self.snapshot_path = self.directory / "tasks.snapshot.json"
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+
+        self._seq = 0
+        self._pending: List[str] = []
+        self._records_since_snapshot = 0
+        self._journal = None
+        self._lock_file = None
+        self._file_lock = threading.Lock()
+        self._io_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._export: Optional[Callable[[], Dict[str, Tuple]]] = None
+
+    def open(self) -> bool:
+        """Create the store directory and take the single-writer lock"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.directory / "tasks.lock", "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                self._lock_file = None
+                return False
+        return True
+
+    def load(self) -> TaskState:
+        """Read the snapshot and replay the journal records written after it"""
+        users: Dict[str, Dict[int, Dict]] = {}
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._seq = snapshot["seq"]
+            for user_id, tasks in snapshot["users"].items():
+                users[user_id] = {task["id"]: task for task in tasks}
+
+        replayed = 0
+        if self.journal_path.exists():
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        logger.warning("Ignoring unreadable task journal record")
+                        continue
+                    if record["seq"] <= self._seq:
+                        continue
+                    self._apply(users, record)
+                    self._seq = record["seq"]
+                    replayed += 1
+
+        self._records_since_snapshot = replayed
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return {user_id: list(tasks.values()) for user_id, tasks in users.items() if tasks}
+
+    @staticmethod
+    def _apply(users: Dict[str, Dict[int, Dict]], record: Dict) -> None:
+        tasks = users.setdefault(record["user"], {})
+        if record["op"] == "add":
+            tasks[record["task"]["id"]] = record["task"]
+        elif record["op"] == "complete":
+            if record["id"] in tasks:
+                tasks[record["id"]]["completed"] = True
+        elif record["op"] == "remove":
+            tasks.pop(record["id"], None)
+
+    def start(self, export: Callable[[], Dict[str, Tuple]]) -> None:
+        """Start the background flusher
+
+        Args:
+            export: Returns the current per-user task snapshots; called on the
+                event loop when compacting
+        """
+        self._export = export
+        self._io_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._run())
+
+    def append(self, record: Dict) -> None:
+        """Queue a journal record; durable after the next flush"""
+        self._seq += 1
+        record["seq"] = self._seq
+        self._records_since_snapshot += 1
+        line = json.dumps(record, separators=(",", ":"))
+        if self.fsync_interval > 0:
+            self._pending.append(line)
+        else:
+            self._write([line])
+
+    async def _run(self) -> None:
+        # With inline fsync there is nothing to batch, but compaction still
+        # needs to be checked periodically.
+        interval = self.fsync_interval or 1.0
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+                if self._records_since_snapshot >= self.snapshot_every:
+                    await self.compact()
+            except OSError:
+                logger.exception("Task store flush failed")
+
+    async def flush(self) -> None:
+        """Write and fsync all queued records"""
+        async with self._io_lock:
+            lines, self._pending = self._pending, []
+            if lines:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+    async def compact(self) -> None:
+        """Write a snapshot of the current state and truncate the journal"""
+        async with self._io_lock:
+            # Queued records are covered by the snapshot taken at this instant,
+            # so they need not be written unless the snapshot fails.
+            pending, self._pending = self._pending, []
+            seq = self._seq
+            state = self._export()
+            covered = self._records_since_snapshot
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write_snapshot, seq, state)
+            except OSError:
+                if pending:
+                    try:
+                        await loop.run_in_executor(None, self._write, pending)
+                    except OSError:
+                        # Keep them ahead of anything queued since
+                        self._pending = pending + self._pending
+                raise
+            self._records_since_snapshot -= covered
+
+    def _write(self, lines: List[str]) -> None:
+        with self._file_lock:
+            self._journal.write("\n".join(lines) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def _write_snapshot(self, seq: int, state: Dict[str, Tuple]) -> None:
+        snapshot = {
+            "seq": seq,
+            "users": {
+                user_id: [task.model_dump(mode="json") for task in tasks]
+                for user_id, tasks in state.items()
+                if tasks
+            },
+        }
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        with self._file_lock:
+            # Inline-fsync appends may have landed after the snapshot was
+            # taken; carry those over into the fresh journal.
+            self._journal.close()
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                tail = [line for line in f if self._record_seq(line) > seq]
+            tmp_path = self.journal_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _record_seq(line: str) -> int:
+        try:
+            return json.loads(line)["seq"]
+        except (json.JSONDecodeError, KeyError):
+            return 0
+
+    async def close(self) -> None:
+        """Stop the flusher, write out queued records and release the lock"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._journal is not None:
+            if self._io_lock is not None:
+                await self.flush()
+            elif self._pending:
+                self._write(self._pending)
+            self._journal.close()
+            self._journal = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
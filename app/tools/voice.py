@@ -0,0 +1,373 @@
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator, List, Optional
+from time import perf_counter
+import asyncio
+import io
+import os
+import re
+import struct
+import tempfile
+import wave
+
+from ..core.config import settings, runtime_dir
+from ..core.metrics import metrics
+from .audio_cache import AudioCache
+from .worker_pool import WorkerPool
+
+# Speech libraries are imported inside the functions that use them, which
+# mostly run in the worker processes below.
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class AudioTooLarge(ValueError):
+    """Raised when an upload exceeds the configured size cap"""
+
+class AudioDecodeError(ValueError):
+    """Raised when an upload is not audio the recognizer can read"""
+
+class NoSpeechDetected(ValueError):
+    """Raised when an upload contains nothing but silence"""
+
+async def read_audio(chunks: AsyncIterator[bytes], max_bytes: int) -> bytes:
+    """
+    Collect an upload into memory, enforcing a size cap as it arrives
+
+    Args:
+        chunks: Async iterator over the upload's bytes
+        max_bytes: Largest accepted upload
+
+    Returns:
+        The complete upload
+
+    Raises:
+        AudioTooLarge: As soon as more than ``max_bytes`` have arrived
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise AudioTooLarge(f"Audio upload exceeds {max_bytes} bytes")
+    return bytes(buffer)
+
+async def iter_upload(upload, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield an UploadFile's contents in chunks"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def decode_audio(data: bytes):
+    """
+    Decode WAV, AIFF or FLAC bytes without touching disk
+
+    Returns:
+        speech_recognition.AudioData for the whole clip
+
+    Raises:
+        AudioDecodeError: If the bytes are not a supported audio format
+    """
+    import speech_recognition as sr
+    recognizer = sr.Recognizer()
+    try:
+        with sr.AudioFile(io.BytesIO(data)) as source:
+            return recognizer.record(source)
+    except (ValueError, EOFError) as e:
+        raise AudioDecodeError(f"Unsupported or corrupt audio: {e}") from e
+
+def decode_pcm(data: bytes):
+    """
+    Decode an audio clip to the 16 kHz mono float32 samples Whisper expects
+
+    Raises:
+        AudioDecodeError: If the bytes are not a supported audio format
+    """
+    import numpy as np
+    audio = decode_audio(data)
+    pcm = audio.get_raw_data(convert_rate=16000, convert_width=2)
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+def trim_silence(pcm, rate: int = 16000, frame_seconds: float = 0.03, threshold: float = 0.01,
+                 max_silence: float = 0.3, padding: float = 0.1, noise_ratio: float = 3.0):
+    """
+    Remove the parts of a clip that contain no speech
+
+    Frames count as speech when their RMS level exceeds both ``threshold``
+    and ``noise_ratio`` times the clip's background level, the quietest
+    tenth of its frames. ``padding`` seconds are kept around speech so
+    word edges are not clipped; beyond that, leading and trailing silence
+    is dropped and pauses are cut to ``max_silence`` seconds.
+
+    Args:
+        pcm: Mono float32 samples in [-1, 1]
+        rate: Sample rate of ``pcm``
+
+    Returns:
+        The samples to transcribe; empty if the clip has no speech
+    """
+    import numpy as np
+    frame = int(rate * frame_seconds)
+    count = len(pcm) // frame
+    if count == 0:
+        return pcm[:0]
+    frames = pcm[:count * frame].reshape(count, frame)
+    level = np.sqrt(np.mean(frames ** 2, axis=1))
+    noise = np.percentile(level, 10)
+    # A steady sound has no quieter frames; never demand more than a quarter of the peak
+    speech = level > max(threshold, min(noise * noise_ratio, level.max() / 4))
+    if not speech.any():
+        return pcm[:0]
+
+    pad = int(round(padding / frame_seconds))
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+    index = np.arange(count)
+    last_speech = np.maximum.accumulate(np.where(speech, index, -1))
+    keep = speech | ((last_speech >= 0) & (index - last_speech <= max_silence / frame_seconds))
+    keep[np.flatnonzero(speech)[-1] + 1:] = False
+    return frames[keep].reshape(-1)
+
+def _init_stt():
+    import whisper
+    return whisper.load_model(settings.STT_MODEL)
+
+def _run_stt(model, pcm) -> str:
+    result = model.transcribe(pcm, fp16=False, language=settings.STT_LANGUAGE or None)
+    return result["text"].strip()
+
+# Each process loads the Whisper model once; transcription stays local
+stt_pool = WorkerPool(
+    "stt", _init_stt, _run_stt,
+    size=settings.STT_WORKERS,
+    max_queue=settings.STT_MAX_QUEUE,
+    job_timeout=settings.STT_TIMEOUT,
+    start_timeout=settings.STT_TIMEOUT,
+)
+
+def prepare_speech(data: bytes):
+    """
+    Decode a clip and trim its silence for transcription
+
+    Raises:
+        AudioDecodeError: If the clip is not a supported audio format
+        NoSpeechDetected: If nothing in the clip is loud enough to be speech
+    """
+    pcm = decode_pcm(data)
+    if not settings.VAD_ENABLED:
+        return pcm
+    speech = trim_silence(
+        pcm,
+        threshold=settings.VAD_THRESHOLD,
+        max_silence=settings.VAD_MAX_SILENCE,
+        padding=settings.VAD_PADDING,
+    )
+    metrics.inc("concierge_stt_trimmed_seconds_total", (len(pcm) - len(speech)) / 16000,
+                help="Seconds of silence removed before transcription")
+    if not len(speech):
+        metrics.inc("concierge_stt_no_speech_total", help="Uploads rejected for containing no speech")
+        raise NoSpeechDetected("No speech detected in the audio")
+    return speech
+
+async def transcribe_audio(data: bytes) -> str:
+    """
+    Transcribe an in-memory audio clip on the STT worker pool
+
+    The clip is decoded and trimmed here, so only speech is sent to the
+    workers and silent clips never reach them.
+
+    Raises:
+        AudioDecodeError: If the clip is not a supported audio format
+        NoSpeechDetected: If the clip contains no speech
+        PoolBusy: If too many transcriptions are already queued
+        WorkerFailed: If transcription timed out or crashed
+    """
+    pcm = await asyncio.get_running_loop().run_in_executor(None, prepare_speech, data)
+    return await stt_pool.submit(pcm)
+
+def _init_tts():
+    import pyttsx3
+    engine = pyttsx3.init()
+    if settings.TTS_VOICE:
+        engine.setProperty("voice", settings.TTS_VOICE)
+    if settings.TTS_RATE:
+        engine.setProperty("rate", settings.TTS_RATE)
+    return engine
+
+def _render_tts(engine, text: str) -> bytes:
+    """Render text to WAV with a worker's engine
+
+    pyttsx3 can only render to a file; it is written to the in-memory
+    runtime directory where available and always removed.
+    """
+    fd, path = tempfile.mkstemp(suffix=".wav", dir=runtime_dir())
+    os.close(fd)
+    try:
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+# pyttsx3 is not thread-safe and slow to initialize, so each engine lives in
+# its own process and is reused for every request it serves
+tts_pool = WorkerPool(
+    "tts", _init_tts, _render_tts,
+    size=settings.TTS_WORKERS,
+    max_queue=settings.TTS_MAX_QUEUE,
+    job_timeout=settings.TTS_TIMEOUT,
+)
+
+# Spoken answers repeat a lot, so rendered speech is cached by content
+tts_cache = AudioCache(
+    "tts",
+    settings.TTS_CACHE_DIR,
+    memory_bytes=settings.TTS_CACHE_MEMORY_BYTES,
+    disk_bytes=settings.TTS_CACHE_DISK_BYTES,
+)
+
+def speech_key(text: str) -> str:
+    """Cache key for ``text`` spoken with the configured voice"""
+    return tts_cache.key(text, engine="pyttsx3", voice=settings.TTS_VOICE, rate=settings.TTS_RATE)
+
+async def synthesize(text: str) -> bytes:
+    """
+    Convert text to WAV audio, from the cache or the TTS worker pool
+
+    Raises:
+        PoolBusy: If too many syntheses are already queued
+        WorkerFailed: If synthesis failed or timed out
+    """
+    return await tts_cache.get_or_render(speech_key(text), lambda: tts_pool.submit(text))
+
+async def open_speech(text: str) -> Optional[BinaryIO]:
+    """
+    Cached WAV file for ``text``, opened for streaming and synthesized if needed
+
+    Returns:
+        The open file, or None if the cache has no disk tier or the clip was
+        evicted again before it could be opened; use ``synthesize`` then
+
+    Raises:
+        PoolBusy: If too many syntheses are already queued
+        WorkerFailed: If synthesis failed or timed out
+    """
+    if tts_cache.directory is None:
+        return None
+    key = speech_key(text)
+    f = await tts_cache.open(key)
+    if f is None:
+        await synthesize(text)
+        f = await tts_cache.open(key)
+    return f
+
+def iter_file(f: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Read an open file in chunks, closing it at the end"""
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+async def prewarm(phrases: Iterable[str]) -> None:
+    """Render fixed phrases ahead of time so they are cache hits when spoken"""
+    for text in phrases:
+        if await tts_cache.path(speech_key(text)) is None:
+            await synthesize(text)
+
+class SentenceSplitter:
+    """Splits a stream of text deltas into sentences as they complete
+
+    A sentence ends at ``.``, ``!`` or ``?`` followed by whitespace, or at a
+    line break. Fragments shorter than ``min_chars`` are held back and
+    joined with the next sentence, so abbreviations and list markers do not
+    become separate, choppy utterances.
+    """
+
+    _boundary = re.compile(r"(?<=[.!?])\s+|\n+")
+
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Add text and return the sentences it completed"""
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in self._boundary.finditer(self._buffer):
+            if match.start() - start >= self.min_chars:
+                sentences.append(self._buffer[start:match.start()].strip())
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text is left once the stream has ended"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+def wav_stream_header(channels: int, sample_width: int, frame_rate: int) -> bytes:
+    """RIFF/WAVE header for a stream whose length is not known up front"""
+    unknown = 0xFFFFFFFF
+    block_align = channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, frame_rate,
+                                frame_rate * block_align, block_align, sample_width * 8)
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+async def speak(deltas: AsyncIterator[str], lookahead: int = 2) -> AsyncIterator[bytes]:
+    """
+    Stream speech for text that is still being generated
+
+    Sentences are synthesized as soon as they are complete, up to
+    ``lookahead`` at a time, and their audio is emitted strictly in order:
+    a WAV header first, then each sentence's PCM frames. The first audio
+    is therefore ready roughly one sentence after the text starts.
+
+    Args:
+        deltas: Text fragments, e.g. LLM token deltas
+        lookahead: Sentences synthesized ahead of the one being sent
+
+    Yields:
+        Chunks of a single WAV stream
+    """
+    start = perf_counter()
+    pending: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(lookahead)
+
+    async def enqueue(sentence: str) -> None:
+        await slots.acquire()
+        pending.put_nowait(asyncio.create_task(synthesize(sentence)))
+
+    async def produce():
+        splitter = SentenceSplitter()
+        try:
+            async for delta in deltas:
+                for sentence in splitter.feed(delta):
+                    await enqueue(sentence)
+            rest = splitter.flush()
+            if rest:
+                await enqueue(rest)
+        finally:
+            pending.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    params = None
+    try:
+        while (task := await pending.get()) is not None:
+            audio = await task
+            slots.release()
+            with wave.open(io.BytesIO(audio)) as clip:
+                if params is None:
+                    params = clip.getparams()
+                    metrics.observe("voice_first_audio", perf_counter() - start)
+                    yield wav_stream_header(params.nchannels, params.sampwidth, params.framerate)
+                yield clip.readframes(clip.getnframes())
+        # Surface errors from the text stream itself
+        await producer
+    finally:
+        producer.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not None:
+                task.cancel()
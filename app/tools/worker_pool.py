@@ -0,0 +1,251 @@
+from typing import Any, Callable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import asyncio
+import logging
+import multiprocessing
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class PoolBusy(Exception):
+    """Raised when a pool's queue is full"""
+
+class WorkerFailed(Exception):
+    """Raised when a job hangs or crashes its worker"""
+
+def _worker_main(conn, initializer: Callable[[], Any], handler: Callable[[Any, Any], Any]) -> None:
+    try:
+        state = initializer()
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if message is None:
+            return
+        kind, payload = message
+        if kind == "ping":
+            conn.send(("pong", None))
+            continue
+        try:
+            result = handler(state, payload)
+        except Exception as e:
+            try:
+                conn.send(("raised", e))
+            except Exception:
+                # Not picklable; report it by name instead
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+            continue
+        conn.send(("ok", result))
+
+class _Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+class WorkerPool:
+    """Fixed pool of processes that each hold expensive, non-thread-safe state
+
+    Every worker process runs ``initializer()`` once at startup, e.g. to
+    create a TTS engine or load a model, and then serves jobs one at a time
+    with ``handler(state, payload)``. Both must be importable module-level
+    functions, since workers are started with the spawn method.
+
+    Jobs wait for an idle worker in FIFO order; once ``size + max_queue``
+    jobs are pending, ``submit`` fails fast with PoolBusy. A job that takes
+    longer than ``job_timeout`` gets its worker killed and replaced, and a
+    periodic health check pings idle workers and replaces any that do not
+    answer.
+    """
+
+    def __init__(self, name: str, initializer: Callable[[], Any], handler: Callable[[Any, Any], Any],
+                 size: int = 2, max_queue: int = 16, job_timeout: float = 30.0,
+                 start_timeout: float = 60.0, health_interval: float = 30.0):
+        self.name = name
+        self.initializer = initializer
+        self.handler = handler
+        self.size = size
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.start_timeout = start_timeout
+        self.health_interval = health_interval
+        self.pending = 0
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        # One thread per worker waits on its pipe so the event loop never does
+        self._io = ThreadPoolExecutor(max_workers=size + 1, thread_name_prefix=f"{name}-pool")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+        self._health: Optional[asyncio.Task] = None
+        self._starting: Optional[asyncio.Task] = None
+        self._recycling = set()
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    def _spawn(self) -> _Worker:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child, self.initializer, self.handler),
+            name=f"{self.name}-worker",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        if not parent.poll(self.start_timeout):
+            process.kill()
+            raise WorkerFailed(f"{self.name} worker did not start within {self.start_timeout}s")
+        try:
+            kind, detail = parent.recv()
+        except EOFError:
+            kind, detail = "error", "exited during startup"
+        if kind != "ready":
+            process.join(1)
+            raise WorkerFailed(f"{self.name} worker failed to start: {detail}")
+        return _Worker(process, parent)
+
+    async def start(self) -> None:
+        """Start the workers; safe to call concurrently, only the first starts them"""
+        if self._starting is None:
+            self._starting = asyncio.create_task(self._start())
+        await asyncio.shield(self._starting)
+
+    async def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            workers = await asyncio.gather(*(loop.run_in_executor(self._io, self._spawn) for _ in range(self.size)))
+        except BaseException:
+            self._starting = None
+            raise
+        self._workers = list(workers)
+        self._idle = asyncio.Queue()
+        for worker in self._workers:
+            self._idle.put_nowait(worker)
+        self._health = asyncio.create_task(self._check_health())
+        logger.info("Started %d %s workers", self.size, self.name)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.process.kill()
+        worker.process.join(5)
+        worker.conn.close()
+        self.restarts += 1
+        metrics.inc(f"concierge_{self.name}_worker_restarts_total", help=f"{self.name} worker processes replaced")
+        replacement = self._spawn()
+        self._workers[self._workers.index(worker)] = replacement
+        return replacement
+
+    def _call(self, worker: _Worker, message, timeout: float):
+        try:
+            worker.conn.send(message)
+            if not worker.conn.poll(timeout):
+                return "timeout", None
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            return "crashed", None
+
+    async def _recycle(self, worker: _Worker, reply: asyncio.Future) -> None:
+        """Return a worker to the idle queue once its outstanding reply is in"""
+        kind, _ = await reply
+        try:
+            if kind in ("timeout", "crashed"):
+                worker = await asyncio.get_running_loop().run_in_executor(self._io, self._replace, worker)
+        except (OSError, WorkerFailed):
+            logger.exception("Could not restart %s worker", self.name)
+        finally:
+            self._idle.put_nowait(worker)
+
+    async def submit(self, payload: Any) -> Any:
+        """
+        Run a job on the next idle worker
+
+        Raises:
+            PoolBusy: If the pool already has ``size + max_queue`` pending jobs
+            WorkerFailed: If the job timed out or crashed its worker
+            Exception: Whatever the handler raised, re-raised here
+        """
+        if not self.started:
+            await self.start()
+        if self.pending >= self.size + self.max_queue:
+            metrics.inc(f"concierge_{self.name}_rejected_total", help=f"{self.name} jobs rejected by backpressure")
+            raise PoolBusy(f"{self.name} pool is busy")
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        start = perf_counter()
+        worker = None
+        try:
+            worker = await self._idle.get()
+            metrics.observe(f"{self.name}_queue_wait", perf_counter() - start)
+            reply = loop.run_in_executor(self._io, self._call, worker, ("job", payload), self.job_timeout)
+            try:
+                kind, result = await asyncio.shield(reply)
+            except asyncio.CancelledError:
+                # The worker is still busy; hand it back once its reply is read
+                task = asyncio.create_task(self._recycle(worker, reply))
+                self._recycling.add(task)
+                task.add_done_callback(self._recycling.discard)
+                worker = None
+                raise
+            if kind in ("timeout", "crashed"):
+                logger.error("%s worker %s (pid %s); restarting it", self.name, kind, worker.process.pid)
+                worker = await loop.run_in_executor(self._io, self._replace, worker)
+                raise WorkerFailed(f"{self.name} job {kind}")
+            if kind == "raised":
+                raise result
+            if kind == "error":
+                raise WorkerFailed(result)
+            return result
+        finally:
+            self.pending -= 1
+            if worker is not None:
+                self._idle.put_nowait(worker)
+
+    async def _check_health(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    kind, _ = await loop.run_in_executor(self._io, self._call, worker, ("ping", None), 5.0)
+                    if kind != "pong":
+                        logger.error("%s worker (pid %s) failed health check; restarting it", self.name, worker.process.pid)
+                        worker = await loop.run_in_executor(self._io, self._replace, worker)
+                except (OSError, WorkerFailed):
+                    logger.exception("Could not restart %s worker", self.name)
+                finally:
+                    self._idle.put_nowait(worker)
+
+    def _terminate(self) -> None:
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(2)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+
+    async def stop(self) -> None:
+        """Stop all workers"""
+        if self._health is not None:
+            self._health.cancel()
+            self._health = None
+        await asyncio.get_running_loop().run_in_executor(self._io, self._terminate)
+        self._workers = []
+        self._idle = None
+        self._starting = None
@@ -0,0 +1,84 @@
+"""Event-loop lag during a login storm, with bcrypt inline vs. in the worker pool
+
+Runs a ticker coroutine that should wake every ``--tick-ms`` and records how
+late each wake-up is, while ``--logins`` concurrent password verifications
+run either directly on the event loop (the old behaviour) or through
+``app.routers.auth.verify_password`` (the bounded worker pool).
+
+Usage:
+    python -m benchmarks.bench_login_storm --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def measure(mode: str, logins: int, tick_ms: float, hashed: str) -> dict:
+    from app.routers import auth
+
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        interval = tick_ms / 1000
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - start - interval) * 1000)
+
+    async def inline_login():
+        # Yield first so the storm interleaves with the ticker like real requests
+        await asyncio.sleep(0)
+        return auth.pwd_context.verify("password123", hashed)
+
+    async def pooled_login():
+        return await auth.verify_password("password123", hashed)
+
+    login = inline_login if mode == "inline" else pooled_login
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(tick_ms / 1000 * 3)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    await tick
+    assert all(results)
+    return {
+        "mode": mode,
+        "logins": logins,
+        "wall_s": round(elapsed, 3),
+        "logins_per_s": round(logins / elapsed, 1),
+        "lag_p50_ms": round(statistics.median(lags), 2),
+        "lag_p99_ms": round(percentile(lags, 99), 2),
+        "lag_max_ms": round(max(lags), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=None, help="PASSWORD_HASH_WORKERS override")
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    from app.routers import auth
+
+    hashed = auth.pwd_context.hash("password123")
+    for mode in ("inline", "pool"):
+        print(json.dumps(asyncio.run(measure(mode, args.logins, args.tick_ms, hashed))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Retrieval latency, throughput, memory and build time on synthetic corpora
+
+For each corpus size and retrieval engine, builds the engine from a
+synthetic knowledge base (see ``benchmarks.synthetic_kb``), then runs
+targeted queries and reports latency percentiles, queries per second,
+hit rate of the target document in the top-k, the resident memory taken by
+the index and the build time. Grading latency is reported for engines whose
+grader runs locally.
+
+Sizes an engine cannot finish within the time budget, extrapolated from
+the previous size, are reported as skipped rather than run.
+
+``--output`` writes all results with the commit they were measured at;
+``--baseline`` compares against such a file and exits non-zero when a
+latency percentile regressed by more than ``--tolerance``.
+
+Usage:
+    python -m benchmarks.bench_retrieval --sizes 100,1000,10000 --engines rag
+    python -m benchmarks.bench_retrieval --output new.json --baseline old.json
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from .synthetic_kb import generate_corpus, generate_queries
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+class RagEngine:
+    """In-process lexical retrieval (``app.models.rag.RAGSystem``)"""
+    name = "rag"
+
+    def __init__(self):
+        # Imported here so module import time is not counted as build time
+        from app.models.rag import RAGSystem
+        self.factory = RAGSystem
+
+    def build(self, kb_path: str, corpus: Dict, workdir: str) -> None:
+        self.system = self.factory(kb_path)
+
+    async def retrieve(self, query: str):
+        return await self.system.retrieve_docs(query)
+
+    async def grade(self, query: str, result):
+        return await self.system.grade_retrieval(query, result)
+
+class ChromaEngine:
+    """Vector retrieval (``app.tools.retrieve_docs.DocumentRetriever``)
+
+    Embeds with Chroma's default local model, which is downloaded on first
+    use. Grading calls the LLM and is not measured.
+    """
+    name = "chroma"
+    batch_size = 5000
+
+    def __init__(self):
+        import chromadb  # noqa: F401
+        from app.tools.retrieve_docs import DocumentRetriever
+        self.factory = DocumentRetriever
+
+    def build(self, kb_path: str, corpus: Dict, workdir: str) -> None:
+        self.retriever = self.factory(path=os.path.join(workdir, "chroma"))
+        documents = corpus["documents"]
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            self.retriever.collection.add(
+                ids=[str(i) for i in range(start, start + len(batch))],
+                documents=[doc["content"] for doc in batch],
+                metadatas=[{"source": doc["source"], **doc["metadata"]} for doc in batch],
+            )
+
+    async def retrieve(self, query: str):
+        return await self.retriever.retrieve_docs(query)
+
+    grade = None
+
+class HybridEngine:
+    """Lexical and vector retrieval fused by rank (``app.tools.retrieve_docs.HybridRetriever``)
+
+    Builds both indexes, so its build time and memory are roughly the sum of
+    the other two engines'.
+    """
+    name = "hybrid"
+
+    def __init__(self):
+        from app.core.config import settings
+        from app.tools.retrieve_docs import HybridRetriever
+        self.lexical = RagEngine()
+        self.vector = ChromaEngine()
+        self.factory = HybridRetriever
+        self.settings = settings
+
+    def build(self, kb_path: str, corpus: Dict, workdir: str) -> None:
+        self.lexical.build(kb_path, corpus, workdir)
+        # Separate from the chroma engine's store when both run
+        self.vector.build(kb_path, corpus, os.path.join(workdir, "hybrid"))
+        self.system = self.factory(
+            self.lexical.system,
+            self.vector.retriever,
+            deadline=self.settings.RETRIEVAL_DEADLINE,
+            candidates=self.settings.RETRIEVAL_CANDIDATES,
+            rrf_k=self.settings.RETRIEVAL_RRF_K,
+        )
+
+    async def retrieve(self, query: str):
+        return await self.system.retrieve_docs(query)
+
+    async def grade(self, query: str, result):
+        return await self.system.grade_retrieval(query, result)
+
+ENGINES = {engine.name: engine for engine in (RagEngine, ChromaEngine, HybridEngine)}
+
+async def run_case(engine, size: int, corpus: Dict, kb_path: str, workdir: str,
+                   queries, budget_s: float) -> Dict:
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    engine.build(kb_path, corpus, workdir)
+    build_s = time.perf_counter() - start
+    gc.collect()
+    rss_after = rss_bytes()
+
+    latencies, grade_latencies, hits = [], [], 0
+    deadline = time.perf_counter() + budget_s
+    start = time.perf_counter()
+    for query, target in queries:
+        t0 = time.perf_counter()
+        result = await engine.retrieve(query)
+        latencies.append(time.perf_counter() - t0)
+        hits += any(doc.source == target for doc in result.docs)
+        if engine.grade is not None:
+            t0 = time.perf_counter()
+            await engine.grade(query, result)
+            grade_latencies.append(time.perf_counter() - t0)
+        if time.perf_counter() > deadline:
+            break
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "engine": engine.name,
+        "docs": size,
+        "queries": len(latencies),
+        "build_s": round(build_s, 3),
+        "index_mb": round((rss_after - rss_before) / 2**20, 1) if rss_before is not None else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "qps": round(len(latencies) / elapsed, 2),
+        "hit_rate": round(hits / len(latencies), 3),
+    }
+    if grade_latencies:
+        result["grade_p50_ms"] = round(statistics.median(grade_latencies) * 1000, 3)
+        result["grade_p99_ms"] = round(percentile(grade_latencies, 99) * 1000, 3)
+    return result
+
+def predicted_skip(previous: Optional[Dict], size: int, min_queries: int,
+                   budget_s: float, build_budget_s: float) -> Optional[str]:
+    """Reason to skip a size, extrapolating linearly from the previous one"""
+    if previous is None or "skipped" in previous:
+        return previous and previous.get("skipped")
+    scale = size / previous["docs"]
+    if previous["build_s"] * scale > build_budget_s:
+        return f"predicted build {previous['build_s'] * scale:.0f}s > {build_budget_s:.0f}s"
+    query_s = previous["p50_ms"] / 1000 * scale * min_queries
+    if query_s > budget_s:
+        return f"predicted {min_queries} queries {query_s:.0f}s > {budget_s:.0f}s"
+    return None
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Describe latency regressions against a baseline results file"""
+    previous = {(r["engine"], r["docs"]): r for r in baseline["results"] if "skipped" not in r}
+    regressions = []
+    for result in results:
+        old = previous.get((result["engine"], result["docs"]))
+        if old is None or "skipped" in result:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if result[key] > old[key] * (1 + tolerance):
+                regressions.append(
+                    f"{result['engine']} @ {result['docs']} docs: {key} {old[key]} -> {result[key]}"
+                )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000,100000,1000000")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--queries", type=int, default=200, help="queries per case")
+    parser.add_argument("--min-queries", type=int, default=20, help="skip sizes that cannot run this many")
+    parser.add_argument("--budget-s", type=float, default=60.0, help="query time budget per case")
+    parser.add_argument("--build-budget-s", type=float, default=600.0, help="build time budget per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write all results as one JSON document")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed latency growth vs. baseline")
+    args = parser.parse_args()
+
+    engines = [ENGINES[name] for name in args.engines.split(",")]
+    previous: Dict[str, Optional[Dict]] = {engine.name: None for engine in engines}
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        corpus = generate_corpus(size, seed=args.seed)
+        queries = generate_queries(corpus, args.queries, seed=args.seed + 1)
+        with tempfile.TemporaryDirectory() as workdir:
+            kb_path = os.path.join(workdir, "knowledge_base.json")
+            with open(kb_path, "w", encoding="utf-8") as f:
+                json.dump(corpus, f)
+            for engine_cls in engines:
+                reason = predicted_skip(previous[engine_cls.name], size, args.min_queries,
+                                        args.budget_s, args.build_budget_s)
+                if reason:
+                    result = {"engine": engine_cls.name, "docs": size, "skipped": reason}
+                else:
+                    try:
+                        result = asyncio.run(run_case(engine_cls(), size, corpus, kb_path, workdir,
+                                                      queries, args.budget_s))
+                    except Exception as e:
+                        result = {"engine": engine_cls.name, "docs": size, "skipped": f"{type(e).__name__}: {e}"}
+                previous[engine_cls.name] = result
+                results.append(result)
+                print(json.dumps(result), flush=True)
+        del corpus
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.time(),
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Worker startup time, with regression thresholds
+
+Each run starts a fresh interpreter that imports ``app.main`` (what uvicorn
+does before a worker can answer ``/health``) and then runs the lifespan
+until ``/ready`` would succeed. Reports the median over ``--runs`` and exits
+non-zero when a threshold is exceeded or a heavy module is imported eagerly
+again, so it can gate CI.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --max-import-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must only be loaded by the lifespan warm-up or on first use
+HEAVY_MODULES = ("openai", "chromadb", "speech_recognition", "pyttsx3")
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+eager = [m for m in {heavy!r} if m in sys.modules]
+
+async def ready():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        while not app.main.app.state.ready:
+            await asyncio.sleep(0.005)
+
+asyncio.run(asyncio.wait_for(ready(), 60))
+done = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "ready_ms": (done - start) * 1000, "eager": eager}}))
+"""
+
+def run_once() -> dict:
+    env = dict(os.environ, TASK_STORE_DIR="")
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(heavy=HEAVY_MODULES)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500.0, help="fail above this median import time")
+    parser.add_argument("--max-ready-ms", type=float, default=10000.0, help="fail above this median time to ready")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "import_ms_p50": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "import_ms_max": round(max(r["import_ms"] for r in runs), 1),
+        "ready_ms_p50": round(statistics.median(r["ready_ms"] for r in runs), 1),
+        "eager_heavy_modules": sorted({m for r in runs for m in r["eager"]}),
+    }
+    failures = []
+    if result["import_ms_p50"] > args.max_import_ms:
+        failures.append(f"import {result['import_ms_p50']}ms > {args.max_import_ms}ms")
+    if result["ready_ms_p50"] > args.max_ready_ms:
+        failures.append(f"ready {result['ready_ms_p50']}ms > {args.max_ready_ms}ms")
+    if result["eager_heavy_modules"]:
+        failures.append(f"imported at startup: {', '.join(result['eager_heavy_modules'])}")
+    result["failures"] = failures
+    print(json.dumps(result))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
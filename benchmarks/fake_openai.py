@@ -0,0 +1,112 @@
+"""Local stand-in for the OpenAI chat completions API
+
+Answers ``POST /v1/chat/completions`` in the same wire format as the real
+API, streaming (server-sent chunks ending in ``[DONE]``) or not, after a
+configurable time to first token and at a configurable token rate. Point
+the app at it with ``OPENAI_BASE_URL=http://127.0.0.1:9100/v1``; the
+OpenAI client picks that up without code changes.
+
+Usage:
+    python -m benchmarks.fake_openai --port 9100 --ttft-ms 300 --tokens-per-s 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "AI can help small businesses automate routine work, answer customer questions, "
+    "forecast demand and find patterns in their data. Start with a narrow use case, "
+    "measure the result, and expand once the value is clear."
+).split()
+
+class Config:
+    """Behaviour of the stand-in, set from the command line"""
+    ttft_ms = 300.0
+    tokens_per_s = 50.0
+    tokens = 60
+    error_rate = 0.0
+
+app = FastAPI(title="Fake OpenAI")
+_ids = itertools.count(1)
+
+def _tokens():
+    return [word + " " for word in itertools.islice(itertools.cycle(WORDS), Config.tokens)]
+
+def _error():
+    return JSONResponse(
+        status_code=500,
+        content={"error": {"message": "Injected failure", "type": "server_error"}},
+    )
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if random.random() < Config.error_rate:
+        return _error()
+    completion_id = f"chatcmpl-fake{next(_ids)}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4")
+    tokens = _tokens()
+    interval = 1 / Config.tokens_per_s
+
+    if not body.get("stream"):
+        await asyncio.sleep(Config.ttft_ms / 1000 + interval * (len(tokens) - 1))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+    def chunk(delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    async def events():
+        await asyncio.sleep(Config.ttft_ms / 1000)
+        yield chunk({"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(interval)
+            yield chunk({"content": token})
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=Config.ttft_ms, help="delay before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=Config.tokens_per_s)
+    parser.add_argument("--tokens", type=int, default=Config.tokens, help="tokens per completion")
+    parser.add_argument("--error-rate", type=float, default=Config.error_rate, help="fraction of 500 responses")
+    args = parser.parse_args()
+    Config.ttft_ms = args.ttft_ms
+    Config.tokens_per_s = args.tokens_per_s
+    Config.tokens = args.tokens
+    Config.error_rate = args.error_rate
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
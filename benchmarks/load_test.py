@@ -0,0 +1,266 @@
+"""End-to-end load generator for the concierge API
+
+Registers ``--users`` users, then runs ``--concurrency`` clients for
+``--duration`` seconds, each repeatedly picking an operation from ``--mix``:
+
+    chat         POST /concierge/chat
+    stream       POST /concierge/chat with stream=true (time to first token)
+    task_create  POST /concierge/tasks
+    task_list    GET /concierge/tasks
+    feedback     POST /concierge/feedback/{good,bad}_answer
+
+Prints one JSON object with p50/p95/p99 latency, time to first token and
+error rates per operation.
+
+With ``--spawn`` it first starts the stand-in LLM (``benchmarks.fake_openai``)
+and the app under uvicorn, wired together through ``OPENAI_BASE_URL`` with
+the per-user rate limit lifted, so the whole run is offline. Users live in
+each worker's in-memory store, so with ``--workers`` above 1 requests that
+land on a worker other than the one that registered the user fail with 401.
+
+Usage:
+    python -m benchmarks.load_test --spawn --duration 30 --ttft-ms 300
+    python -m benchmarks.load_test --base-url http://localhost:8000 --mix chat=1
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+QUESTIONS = (
+    "What is machine learning?",
+    "How can AI help my business?",
+    "What is deep learning?",
+    "How does natural language processing work?",
+    "What is computer vision used for?",
+)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+class Recorder:
+    """Collects per-operation outcomes"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.ttft: List[float] = []
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, op: str, latency: float, status: str) -> None:
+        self.statuses[op][status] += 1
+        if status == "200":
+            self.latencies[op].append(latency)
+
+    def summary(self, elapsed: float) -> Dict:
+        ops = {}
+        for op, statuses in sorted(self.statuses.items()):
+            total = sum(statuses.values())
+            latencies = self.latencies[op]
+            ops[op] = {
+                "requests": total,
+                "error_rate": round(1 - statuses["200"] / total, 4),
+                "statuses": dict(statuses),
+            }
+            if latencies:
+                ops[op].update({
+                    "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                })
+        total = sum(sum(s.values()) for s in self.statuses.values())
+        errors = total - sum(s["200"] for s in self.statuses.values())
+        result = {
+            "duration_s": round(elapsed, 1),
+            "requests": total,
+            "rps": round(total / elapsed, 1),
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "operations": ops,
+        }
+        if self.ttft:
+            result["ttft_ms"] = {
+                "p50": round(statistics.median(self.ttft) * 1000, 1),
+                "p95": round(percentile(self.ttft, 95) * 1000, 1),
+                "p99": round(percentile(self.ttft, 99) * 1000, 1),
+            }
+        return result
+
+class User:
+    def __init__(self, name: str, token: str):
+        self.name = name
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.chatted = False
+
+async def op_chat(client: httpx.AsyncClient, user: User, recorder: Recorder) -> httpx.Response:
+    response = await client.post(
+        "/concierge/chat", headers=user.headers,
+        json={"message": random.choice(QUESTIONS)},
+    )
+    user.chatted = user.chatted or response.status_code == 200
+    return response
+
+async def op_stream(client: httpx.AsyncClient, user: User, recorder: Recorder) -> httpx.Response:
+    start = time.perf_counter()
+    async with client.stream(
+        "POST", "/concierge/chat", headers=user.headers,
+        json={"message": random.choice(QUESTIONS), "stream": True},
+    ) as response:
+        first = True
+        async for line in response.aiter_lines():
+            if first and line.startswith("data:"):
+                recorder.ttft.append(time.perf_counter() - start)
+                first = False
+    user.chatted = user.chatted or response.status_code == 200
+    return response
+
+async def op_task_create(client: httpx.AsyncClient, user: User, recorder: Recorder) -> httpx.Response:
+    return await client.post(
+        "/concierge/tasks", headers=user.headers,
+        json={"title": f"Follow-up {uuid.uuid4().hex[:8]}", "when": "tomorrow at 10am", "description": "Load test"},
+    )
+
+async def op_task_list(client: httpx.AsyncClient, user: User, recorder: Recorder) -> httpx.Response:
+    return await client.get("/concierge/tasks", headers=user.headers, params={"limit": 50})
+
+async def op_feedback(client: httpx.AsyncClient, user: User, recorder: Recorder) -> httpx.Response:
+    kind = random.choice(("good_answer", "bad_answer"))
+    return await client.post(f"/concierge/feedback/{kind}", headers=user.headers)
+
+OPERATIONS = {
+    "chat": op_chat,
+    "stream": op_stream,
+    "task_create": op_task_create,
+    "task_list": op_task_list,
+    "feedback": op_feedback,
+}
+
+async def register_users(client: httpx.AsyncClient, count: int) -> List[User]:
+    run = uuid.uuid4().hex[:6]
+
+    async def register(i: int) -> User:
+        name = f"load-{run}-{i}"
+        response = await client.post("/register", json={"username": name, "password": "load-test-pw"})
+        response.raise_for_status()
+        return User(name, response.json()["access_token"])
+
+    return await asyncio.gather(*(register(i) for i in range(count)))
+
+async def run_load(base_url: str, users: int, concurrency: int, duration: float, mix: Dict[str, float]) -> Dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        accounts = await register_users(client, users)
+        names, weights = list(mix), list(mix.values())
+        deadline = time.perf_counter() + duration
+
+        async def worker(i: int):
+            while time.perf_counter() < deadline:
+                user = random.choice(accounts)
+                op = random.choices(names, weights)[0]
+                if op == "feedback" and not user.chatted:
+                    # Feedback needs a session; it would only measure 404s
+                    op = "chat"
+                start = time.perf_counter()
+                try:
+                    response = await OPERATIONS[op](client, user, recorder)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                recorder.record(op, time.perf_counter() - start, status)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return recorder.summary(time.perf_counter() - start)
+
+async def wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            with contextlib.suppress(httpx.HTTPError):
+                if (await client.get(url)).status_code == 200:
+                    return
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"{url} did not become ready within {timeout:.0f}s")
+
+@contextlib.contextmanager
+def spawn_stack(args):
+    """Start the stand-in LLM and the app, torn down on exit"""
+    workdir = tempfile.mkdtemp(prefix="concierge-load-")
+    llm = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.llm_port),
+        "--ttft-ms", str(args.ttft_ms), "--tokens-per-s", str(args.tokens_per_s),
+        "--error-rate", str(args.llm_error_rate),
+    ])
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="fake",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1",
+        RATE_LIMIT_PER_MINUTE="1000000",
+        RATE_LIMIT_DB=os.path.join(workdir, "rate_limit.sqlite3"),
+        METRICS_DIR=os.path.join(workdir, "metrics"),
+        TASK_STORE_DIR=os.path.join(workdir, "tasks"),
+    )
+    api = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ], env=env, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready(f"http://127.0.0.1:{args.llm_port}/docs"))
+        asyncio.run(wait_ready(f"http://127.0.0.1:{args.app_port}/ready"))
+        yield f"http://127.0.0.1:{args.app_port}"
+    finally:
+        for process in (api, llm):
+            process.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                process.wait(10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", default="chat=4,stream=2,task_create=1,task_list=2,feedback=1")
+    parser.add_argument("--output", help="also write the summary to this file")
+    spawn = parser.add_argument_group("spawned stack")
+    spawn.add_argument("--spawn", action="store_true", help="start the stand-in LLM and the app")
+    spawn.add_argument("--workers", type=int, default=1)
+    spawn.add_argument("--app-port", type=int, default=8100)
+    spawn.add_argument("--llm-port", type=int, default=9100)
+    spawn.add_argument("--ttft-ms", type=float, default=300.0)
+    spawn.add_argument("--tokens-per-s", type=float, default=50.0)
+    spawn.add_argument("--llm-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with spawn_stack(args) if args.spawn else contextlib.nullcontext(args.base_url) as base_url:
+        summary = asyncio.run(run_load(base_url, args.users, args.concurrency, args.duration, mix))
+    summary["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    print(json.dumps(summary))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Synthetic knowledge bases in the schema of ``knowledge_base.json``
+
+Documents draw words from a Zipf-distributed vocabulary, like natural text,
+and each one belongs to a topic and subtopic whose words it repeats. Every
+document gets a unique ``source``, so a query built from one document can be
+scored as a hit or a miss.
+
+Usage:
+    python -m benchmarks.synthetic_kb --docs 10000 --out kb_10k.json
+"""
+from typing import Dict, List, Tuple
+import argparse
+import itertools
+import json
+import random
+
+TOPICS = (
+    "machine_learning", "deep_learning", "natural_language_processing", "computer_vision",
+    "reinforcement_learning", "speech_recognition", "recommendation_systems", "chatbots",
+    "predictive_analytics", "process_automation", "fraud_detection", "demand_forecasting",
+    "customer_segmentation", "document_processing", "sentiment_analysis", "anomaly_detection",
+)
+SUBTOPICS = (
+    "basics", "use_cases", "costs", "data_requirements", "tools", "integration",
+    "privacy", "evaluation", "deployment", "training", "limitations", "roi",
+)
+
+def _vocabulary(size: int, rng: random.Random) -> List[str]:
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def generate_corpus(num_docs: int, seed: int = 0, words_per_doc: int = 60, vocab_size: int = 5000) -> Dict:
+    """
+    Generate a knowledge base
+
+    Args:
+        num_docs: Number of documents
+        seed: Random seed; the same seed always yields the same corpus
+        words_per_doc: Approximate document length in words
+        vocab_size: Number of distinct filler words
+
+    Returns:
+        Dict with a ``documents`` list, as in knowledge_base.json
+    """
+    rng = random.Random(seed)
+    vocab = _vocabulary(vocab_size, rng)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, vocab_size + 1)))
+    documents = []
+    for i in range(num_docs):
+        topic = TOPICS[rng.randrange(len(TOPICS))]
+        subtopic = SUBTOPICS[rng.randrange(len(SUBTOPICS))]
+        words = rng.choices(vocab, cum_weights=cum_weights, k=words_per_doc)
+        words += topic.split("_") + subtopic.split("_")
+        rng.shuffle(words)
+        documents.append({
+            "content": " ".join(words).capitalize() + ".",
+            "source": f"Synthetic KB, document {i}",
+            "metadata": {"topic": topic, "subtopic": subtopic},
+        })
+    return {"documents": documents}
+
+def generate_queries(corpus: Dict, count: int, seed: int = 1, words: int = 5) -> List[Tuple[str, str]]:
+    """
+    Build queries that each target one document
+
+    Args:
+        corpus: Corpus from generate_corpus
+        count: Number of queries
+        seed: Random seed
+        words: Content words sampled from the target document
+
+    Returns:
+        List of (query, source of the target document)
+    """
+    rng = random.Random(seed)
+    documents = corpus["documents"]
+    queries = []
+    for _ in range(count):
+        doc = documents[rng.randrange(len(documents))]
+        terms = rng.sample(doc["content"].rstrip(".").lower().split(), words)
+        topic = doc["metadata"]["topic"].replace("_", " ")
+        queries.append((f"{topic} {' '.join(terms)}", doc["source"]))
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(generate_corpus(args.docs, args.seed), f)
+
+if __name__ == "__main__":
+    main()
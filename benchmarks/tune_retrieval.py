@@ -0,0 +1,278 @@
+"""Tune retrieval parameters against labelled questions
+
+Sweeps the retrieval engine, k, the relevance threshold, the similarity
+blend and topic matching, plus the fusion depth and constant and the vector
+distance cutoff for the hybrid engine, and scores every configuration on a
+labelled question set:
+
+- recall@k: share of answerable questions whose expected source is returned
+- MRR: mean reciprocal rank of the expected source, 0 when not returned
+- rejection: share of unanswerable questions (``"source": null``) for which
+  nothing is returned, if the label file has any
+- p50/p95 retrieval latency and the index's memory
+
+One JSON line is printed per configuration. A configuration is Pareto
+optimal when no other one is at least as good on every objective and better
+on one; k counts as a cost, since every returned document goes into the LLM
+prompt. The best Pareto-optimal configuration within ``--max-p95-ms`` is
+reported, and the grader's coverage cutoff is chosen for it so that "some
+document covers the question" best predicts a hit.
+
+With ``--output`` the configuration is written together with the front;
+point RETRIEVAL_CONFIG_PATH at it, or write to that path, for the service
+to load it. Writing needs real labels that include unanswerable questions,
+since without them nothing rewards a relevance threshold and the chosen one
+would stop the service from recognising out-of-scope questions.
+
+Hybrid latency is modelled from the measured latency of each engine, which
+run concurrently under RETRIEVAL_DEADLINE in the service.
+
+Label files are JSON lines such as ``{"question": "...", "source": "..."}``.
+Without ``--labels`` a synthetic corpus and questions are generated, and
+the run only reports.
+
+Usage:
+    python -m benchmarks.tune_retrieval --kb knowledge_base.json --labels labels.jsonl --output retrieval_config.json
+    python -m benchmarks.tune_retrieval --synthetic 1000 --engines lexical --max-p95-ms 50
+"""
+from typing import Dict, List, NamedTuple, Optional
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from .bench_retrieval import ChromaEngine, git_commit, percentile, rss_bytes
+from .synthetic_kb import generate_corpus, generate_queries
+
+SCORING_GRID = {"similarity": ("max", "jaccard", "sequence"), "use_topics": (True, False)}
+RESULT_GRID = {"k": (1, 3, 5, 10), "min_score": (0.0, 0.05, 0.1, 0.2)}
+FUSION_GRID = {"candidates": (5, 10, 20), "rrf_k": (10, 60), "max_distance": (0.6, 0.8, 1.0, 1.5)}
+GRADE_CUTOFFS = (0.1, 0.2, 0.3, 0.4, 0.5)
+
+# (metric, True if higher is better)
+OBJECTIVES = (("recall", True), ("mrr", True), ("rejection", True), ("p95_ms", False), ("index_mb", False), ("k", False))
+
+class Hit(NamedTuple):
+    source: str
+    content: str
+    score: float  # lexical similarity, or distance from the query for vector hits
+
+def grid(spec: Dict) -> List[Dict]:
+    return [dict(zip(spec, values)) for values in itertools.product(*spec.values())]
+
+def load_labels(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def evaluate(rankings: List[List[Hit]], labels: List[Dict], k: int) -> Dict:
+    """Recall@k, MRR and rejection of the top-``k`` of each ranking"""
+    hits, reciprocal_ranks, answerable, rejected, unanswerable = 0, 0.0, 0, 0, 0
+    for ranking, label in zip(rankings, labels):
+        returned = [hit.source for hit in ranking[:k]]
+        if label.get("source") is None:
+            unanswerable += 1
+            rejected += not returned
+            continue
+        answerable += 1
+        if label["source"] in returned:
+            hits += 1
+            reciprocal_ranks += 1 / (returned.index(label["source"]) + 1)
+    return {
+        "recall": round(hits / answerable, 4) if answerable else None,
+        "mrr": round(reciprocal_ranks / answerable, 4) if answerable else None,
+        "rejection": round(rejected / unanswerable, 4) if unanswerable else None,
+    }
+
+def dominates(a: Dict, b: Dict) -> bool:
+    better = False
+    for metric, higher in OBJECTIVES:
+        x, y = a.get(metric), b.get(metric)
+        if x is None or y is None:
+            continue
+        if (x < y) if higher else (x > y):
+            return False
+        better = better or x != y
+    return better
+
+def pareto_front(results: List[Dict]) -> List[Dict]:
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+def choose(front: List[Dict], max_p95_ms: Optional[float]) -> Dict:
+    """Most accurate configuration on the front within the latency budget"""
+    within = [r for r in front if max_p95_ms is None or r["p95_ms"] <= max_p95_ms]
+    if not within:
+        return min(front, key=lambda r: r["p95_ms"])
+    return max(within, key=lambda r: (r["recall"] or 0, r["mrr"] or 0, r["rejection"] or 0, -r["p95_ms"], -r["k"]))
+
+def lexical_rankings(system, labels: List[Dict], depth: int):
+    """Top-``depth`` hits per question and the time each took to score"""
+    rankings, latencies = [], []
+    for label in labels:
+        start = time.perf_counter()
+        scored = system.score_docs(label["question"])
+        latencies.append(time.perf_counter() - start)
+        rankings.append([Hit(doc["source"], doc["content"], score) for doc, score in scored[:depth]])
+    return rankings, latencies
+
+def vector_rankings(retriever, labels: List[Dict], depth: int):
+    rankings, latencies = [], []
+    for label in labels:
+        start = time.perf_counter()
+        results = retriever.collection.query(query_texts=[label["question"]], n_results=depth)
+        latencies.append(time.perf_counter() - start)
+        rankings.append([
+            Hit(metadata.get("source", "Unknown"), content, distance)
+            for content, metadata, distance in zip(results["documents"][0], results["metadatas"][0],
+                                                   results["distances"][0])
+        ])
+    return rankings, latencies
+
+def summarize(config: Dict, rankings, labels, latencies, index_mb: float) -> Dict:
+    return {
+        **config,
+        **evaluate(rankings, labels, config["k"]),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "index_mb": index_mb,
+    }
+
+def sweep_lexical(system, labels, scoring: Dict, index_mb: float, results: List[Dict], cache: Dict) -> None:
+    depth = max(max(RESULT_GRID["k"]), max(FUSION_GRID["candidates"]))
+    rankings, latencies = lexical_rankings(system, labels, depth)
+    cache[tuple(scoring.items())] = (rankings, latencies)
+    for params in grid(RESULT_GRID):
+        filtered = [[hit for hit in ranking if hit.score > params["min_score"]] for ranking in rankings]
+        config = {"engine": "lexical", **scoring, **params}
+        results.append(summarize(config, filtered, labels, latencies, index_mb))
+        print(json.dumps(results[-1]), flush=True)
+
+def sweep_hybrid(lexical_cache: Dict, vector, labels, index_mb: float, deadline: float, results: List[Dict]) -> None:
+    from app.tools.retrieve_docs import reciprocal_rank_fusion
+    vector_ranked, vector_latencies = vector
+    for scoring_items, (lexical_ranked, lexical_latencies) in lexical_cache.items():
+        # Engines run concurrently; a late vector search is cut off at the deadline
+        latencies = [max(lex, min(vec, deadline)) for lex, vec in zip(lexical_latencies, vector_latencies)]
+        for fusion, params in itertools.product(grid(FUSION_GRID), grid(RESULT_GRID)):
+            fused = []
+            for lexical_hits, vector_hits, vector_s in zip(lexical_ranked, vector_ranked, vector_latencies):
+                lists = [[hit for hit in lexical_hits[:fusion["candidates"]] if hit.score > params["min_score"]]]
+                if vector_s <= deadline:
+                    lists.append([hit for hit in vector_hits[:fusion["candidates"]]
+                                  if hit.score <= fusion["max_distance"]])
+                fused.append(reciprocal_rank_fusion(lists, params["k"], fusion["rrf_k"]))
+            config = {"engine": "hybrid", **dict(scoring_items), **fusion, **params}
+            results.append(summarize(config, fused, labels, latencies, index_mb))
+            print(json.dumps(results[-1]), flush=True)
+
+async def tune_grader(system, config: Dict, labels: List[Dict], rankings: List[List[Hit]]) -> Dict:
+    """Coverage cutoff whose "covered" verdict best agrees with retrieval hits"""
+    from app.models.rag import Document, RetrievalConfig, RetrievalResult
+    agreement = {}
+    for cutoff in GRADE_CUTOFFS:
+        system.config = system.config.model_copy(update={"grade_cutoff": cutoff, "k": config["k"]})
+        agree = 0
+        for ranking, label in zip(rankings, labels):
+            returned = ranking[:config["k"]]
+            result = RetrievalResult(query=label["question"],
+                                     docs=[Document(content=hit.content, source=hit.source) for hit in returned])
+            grade = await system.grade_retrieval(label["question"], result)
+            hit = label.get("source") is not None and any(h.source == label["source"] for h in returned)
+            agree += (grade.answer_coverage > 0) == hit
+        agreement[cutoff] = round(agree / len(labels), 4)
+    # Ties keep the cutoff closest to the service default
+    default = RetrievalConfig().grade_cutoff
+    best = max(agreement, key=lambda cutoff: (agreement[cutoff], -abs(cutoff - default)))
+    return {"grade_cutoff": best, "grade_agreement": agreement[best], "grade_sweep": agreement}
+
+async def run(args) -> Dict:
+    from app.core.config import settings
+    from app.models.rag import RAGSystem, RetrievalConfig
+    from app.tools.knowledge_bases import estimate_size
+
+    workdir = tempfile.mkdtemp(prefix="tune_retrieval_")
+    if args.labels:
+        kb_path, labels = args.kb, load_labels(args.labels)
+        with open(kb_path, encoding="utf-8") as f:
+            corpus = json.load(f)
+    else:
+        corpus = generate_corpus(args.synthetic, seed=args.seed)
+        labels = [{"question": q, "source": s}
+                  for q, s in generate_queries(corpus, args.queries, seed=args.seed + 1)]
+        kb_path = os.path.join(workdir, "knowledge_base.json")
+        with open(kb_path, "w", encoding="utf-8") as f:
+            json.dump(corpus, f)
+
+    system = RAGSystem(kb_path)
+    lexical_mb = round(estimate_size(system.knowledge_base) / 2**20, 2)
+    results: List[Dict] = []
+    cache: Dict = {}
+    for scoring in grid(SCORING_GRID):
+        system.config = RetrievalConfig(**scoring)
+        sweep_lexical(system, labels, scoring, lexical_mb, results, cache)
+
+    if "hybrid" in args.engines:
+        try:
+            gc.collect()
+            rss_before = rss_bytes()
+            chroma = ChromaEngine()
+            chroma.build(kb_path, corpus, workdir)
+            vector = vector_rankings(chroma.retriever, labels, max(FUSION_GRID["candidates"]))
+            gc.collect()
+            vector_mb = (rss_bytes() - rss_before) / 2**20 if rss_before is not None else 0.0
+            sweep_hybrid(cache, vector, labels, round(lexical_mb + vector_mb, 2), settings.RETRIEVAL_DEADLINE, results)
+        except Exception as e:
+            print(json.dumps({"engine": "hybrid", "skipped": f"{type(e).__name__}: {e}"}), flush=True)
+
+    front = pareto_front(results)
+    best = choose(front, args.max_p95_ms)
+    scoring_key = tuple((name, best[name]) for name in SCORING_GRID)
+    system.config = RetrievalConfig(**dict(scoring_key))
+    rankings = cache[scoring_key][0]
+    if best["engine"] == "lexical":
+        rankings = [[hit for hit in ranking if hit.score > best["min_score"]] for ranking in rankings]
+    grader = await tune_grader(system, best, labels, rankings)
+
+    config = RetrievalConfig(**{name: best[name] for name in RetrievalConfig.model_fields if name in best},
+                             grade_cutoff=grader["grade_cutoff"])
+    return {
+        "config": config.model_dump(),
+        "metrics": {key: best[key] for key in ("recall", "mrr", "rejection", "p50_ms", "p95_ms", "index_mb")},
+        "grader": grader,
+        "pareto": front,
+        "kb": args.kb if args.labels else f"synthetic:{args.synthetic}",
+        "questions": len(labels),
+        "commit": git_commit(),
+        "timestamp": time.time(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", default="knowledge_base.json", help="knowledge base the labels refer to")
+    parser.add_argument("--labels", help="JSON lines of {question, source}; source null if unanswerable")
+    parser.add_argument("--synthetic", type=int, default=1000, help="corpus size when no labels are given")
+    parser.add_argument("--queries", type=int, default=200, help="synthetic questions")
+    parser.add_argument("--engines", default="lexical,hybrid")
+    parser.add_argument("--max-p95-ms", type=float, help="latency budget for the chosen configuration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the chosen configuration for RETRIEVAL_CONFIG_PATH")
+    args = parser.parse_args()
+    if args.output and not args.labels:
+        parser.error("--output needs --labels; synthetic questions only report")
+    if args.output and all(label.get("source") is not None for label in load_labels(args.labels)):
+        parser.error('--output needs unanswerable questions ("source": null) among the labels')
+
+    tuned = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(tuned, f, indent=2)
+    print(json.dumps({"chosen": tuned["config"], **tuned["metrics"], "pareto_size": len(tuned["pareto"]),
+                      "output": args.output}), flush=True)
+
+if __name__ == "__main__":
+    main()